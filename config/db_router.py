@@ -0,0 +1,167 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def replica_pin_key(user_id):
+    return f"db:replica_pin:{user_id}"
+
+
+class RoutingState:
+    """
+    Контекст маршрутизации текущего запроса или задачи: можно ли читать
+    с реплик и закреплён ли пользователь за основной БД.
+    """
+
+    def __init__(self, read_only, request=None):
+        self.read_only = read_only
+        self.request = request
+        self.pinned = None
+
+
+_state = ContextVar("db_routing_state", default=None)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Разрешает чтение с реплик вне HTTP-запроса — в отчётах и задачах Celery,
+    которым не важно отставание реплики на доли секунды.
+    """
+    token = _state.set(RoutingState(read_only=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Читает из основной БД даже внутри безопасного запроса — например, при
+    заполнении общего кэша, который не должен получить данные отстающей реплики.
+    """
+    token = _state.set(RoutingState(read_only=False))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def _resolved_user(request):
+    # request.user не вычисляется здесь: загрузка пользователя сама читает БД.
+    # DRF после аутентификации записывает пользователя в request напрямую
+    user = request.__dict__.get("user")
+    if type(user) is SimpleLazyObject:
+        user = user._wrapped
+    return None if user is empty else user
+
+
+def _is_pinned(state):
+    if state.pinned is None and state.request is not None:
+        user = _resolved_user(state.request)
+        if user is None:
+            # Пользователь ещё не известен (идёт аутентификация)
+            return False
+        state.pinned = user.is_authenticated and bool(
+            cache.get(replica_pin_key(user.pk))
+        )
+    return bool(state.pinned)
+
+
+class ReplicaRouter:
+    """
+    Направляет чтение на реплики из DATABASE_REPLICAS, запись — в основную БД.
+
+    С реплик читают только безопасные HTTP-запросы (GET, HEAD, OPTIONS) и код
+    внутри replica_reads(). Основная БД используется, если:
+    - запрос изменяет данные (POST, PUT, PATCH, DELETE);
+    - открыта транзакция — в ней могут быть ещё не закоммиченные изменения;
+    - код выполняется внутри primary_reads();
+    - пользователь недавно сам изменял данные (read-your-writes): после его
+      изменяющего запроса он на REPLICA_PIN_SECONDS закрепляется за основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        state = _state.get()
+        if not replicas or state is None or not state.read_only:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or _is_pinned(state):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Явно: иначе Django сохранил бы объект в БД, из которой он прочитан
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему репликацией из основной БД
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Передаёт ReplicaRouter контекст запроса и после изменяющего запроса
+    закрепляет пользователя за основной БД на REPLICA_PIN_SECONDS.
+    Закрепление хранится в кэше, поэтому общий кэш (Redis) нужен, чтобы оно
+    действовало во всех процессах.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _state.set(RoutingState(request.method in SAFE_METHODS, request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if self.should_pin(request):
+            cache.set(
+                replica_pin_key(request.user.pk), True, settings.REPLICA_PIN_SECONDS
+            )
+        return response
+
+    async def __acall__(self, request):
+        token = _state.set(RoutingState(request.method in SAFE_METHODS, request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if self.should_pin(request):
+            await cache.aset(
+                replica_pin_key(request.user.pk), True, settings.REPLICA_PIN_SECONDS
+            )
+        return response
+
+    @staticmethod
+    def should_pin(request):
+        if not settings.DATABASE_REPLICAS or request.method in SAFE_METHODS:
+            return False
+        # Пользователь, которого представление не загружало, ничего не изменял
+        user = _resolved_user(request)
+        return user is not None and user.is_authenticated
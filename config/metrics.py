@@ -0,0 +1,280 @@
+import hmac
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограммы длительности запросов (секунды)
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше SQL-запросов, чем объявлено в query_budget."""
+
+
+class RequestMetrics:
+    """
+    Метрики одного запроса: количество SQL-запросов и время их выполнения
+    записывает record_query.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.total_time = 0.0
+        self.view_name = "unresolved"
+        self.query_budget = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    @property
+    def app_time(self):
+        # Код представления: права, сериализация, рендеринг — всё, кроме БД
+        return max(self.total_time - self.db_time, 0.0)
+
+    @property
+    def over_budget(self):
+        return self.query_budget is not None and self.queries > self.query_budget
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f"app;dur={self.app_time * 1000:.1f}, "
+            f"total;dur={self.total_time * 1000:.1f}"
+        )
+
+
+# Метрики текущего запроса. Контекст копируется в sync_to_async, поэтому
+# запросы к БД из потоков синхронных представлений под ASGI тоже учитываются
+_current_metrics = ContextVar("request_metrics", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper, постоянно подключённый к каждому соединению с БД:
+    соединения локальны для потока, а представление под ASGI выполняется
+    не в том потоке, что middleware.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+# Соединения, открытые до импорта модуля, сигнал уже пропустили
+for _connection in connections.all(initialized_only=True):
+    install_query_recorder(_connection)
+
+
+def get_query_budget(request):
+    """
+    Бюджет запросов представления: атрибут query_budget класса — число или
+    словарь по HTTP-методам ({"get": 5, "post": 3}). None — без ограничения.
+    """
+    match = request.resolver_match
+    if match is None:
+        return None
+    view_class = getattr(match.func, "cls", None) or getattr(
+        match.func, "view_class", None
+    )
+    budget = getattr(view_class, "query_budget", None)
+    if isinstance(budget, dict):
+        return budget.get(request.method.lower())
+    return budget
+
+
+class MetricsRegistry:
+    """
+    Накопленные метрики процесса по представлениям и HTTP-методам.
+
+    Реестр живёт в памяти процесса и не объединяется между воркерами: при
+    нескольких воркерах gunicorn каждый опрос /metrics/ попадает в случайный
+    воркер и видит только его долю запросов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, method, metrics):
+        key = (metrics.view_name, method)
+        with self._lock:
+            stats = self._stats.setdefault(
+                key,
+                {
+                    "count": 0,
+                    "duration": 0.0,
+                    "buckets": [0] * len(DURATION_BUCKETS),
+                    "queries": 0,
+                    "db_duration": 0.0,
+                    "over_budget": 0,
+                },
+            )
+            stats["count"] += 1
+            stats["duration"] += metrics.total_time
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if metrics.total_time <= bound:
+                    stats["buckets"][i] += 1
+            stats["queries"] += metrics.queries
+            stats["db_duration"] += metrics.db_time
+            stats["over_budget"] += int(metrics.over_budget)
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        with self._lock:
+            stats = {key: {**value} for key, value in self._stats.items()}
+
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by view.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (view, method), value in sorted(stats.items()):
+            labels = f'view="{view}",method="{method}"'
+            for bound, count in zip(DURATION_BUCKETS, value["buckets"]):
+                lines.append(
+                    f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} '
+                    f"{count}"
+                )
+            lines.append(
+                f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} '
+                f"{value['count']}"
+            )
+            lines.append(
+                f"http_request_duration_seconds_sum{{{labels}}} {value['duration']:.6f}"
+            )
+            lines.append(
+                f"http_request_duration_seconds_count{{{labels}}} {value['count']}"
+            )
+
+        for name, field, help_text in (
+            ("http_request_db_queries_total", "queries", "SQL queries by view."),
+            (
+                "http_request_db_duration_seconds_total",
+                "db_duration",
+                "Time spent in SQL queries by view.",
+            ),
+            (
+                "http_request_query_budget_exceeded_total",
+                "over_budget",
+                "Requests that exceeded the view query budget.",
+            ),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (view, method), value in sorted(stats.items()):
+                number = value[field]
+                number = f"{number:.6f}" if isinstance(number, float) else number
+                lines.append(f'{name}{{view="{view}",method="{method}"}} {number}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Считает SQL-запросы, время в БД и общее время каждого запроса.
+
+    Метрики накапливаются в registry (эндпоинт /metrics/), при SERVER_TIMING
+    отдаются клиенту в заголовке Server-Timing. Если представление объявило
+    query_budget и превысило его, в журнал пишется предупреждение, а при
+    QUERY_BUDGET_STRICT (по умолчанию в тестах) выбрасывается QueryBudgetExceeded.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Под ASGI с async-представлениями middleware не занимает поток
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics)
+
+    def process_metrics(self, request, response, metrics):
+        metrics.total_time = time.perf_counter() - metrics.started
+
+        if request.resolver_match is not None:
+            metrics.view_name = request.resolver_match.view_name
+        metrics.query_budget = get_query_budget(request)
+        registry.record(request.method, metrics)
+
+        # Тестовый клиент сохраняет ответ — метрики доступны в тестах
+        response.request_metrics = metrics
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = metrics.server_timing()
+
+        if metrics.over_budget:
+            message = (
+                f"{request.method} {metrics.view_name}: {metrics.queries} SQL-запросов "
+                f"при бюджете {metrics.query_budget}"
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+def metrics_view(request):
+    """
+    Метрики в формате Prometheus. Доступ по заголовку
+    Authorization: Bearer <METRICS_TOKEN>; без токена эндпоинт отключён.
+
+    Отдаёт метрики только обработавшего запрос процесса, поэтому верен при
+    одном воркере на экземпляр приложения (так запускаются Dockerfile и
+    docker-compose); масштабировать в этом случае нужно числом экземпляров,
+    опрашивая каждый из них.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    provided = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(provided.encode(), token.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
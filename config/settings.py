@@ -1,6 +1,9 @@
+import copy
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
+
 from environs import env
 
 env.read_env()
@@ -20,6 +23,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "users",
     "rest_framework",
     "courses",
@@ -30,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -37,10 +42,18 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "config.db_router.ReplicaRoutingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
 
+# Метрики запросов (config.metrics): заголовок Server-Timing в ответах,
+# токен эндпоинта /metrics/ (пустой — эндпоинт отключён) и строгий режим
+# бюджетов SQL-запросов представлений (включён при запуске тестов)
+SERVER_TIMING = env.bool("SERVER_TIMING", False)
+METRICS_TOKEN = env("METRICS_TOKEN", "")
+QUERY_BUDGET_STRICT = env.bool("QUERY_BUDGET_STRICT", "test" in sys.argv)
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -69,6 +82,46 @@ DATABASES = {
     }
 }
 
+# Соединения с БД. Роль процесса задаёт размер пула: web — gunicorn (потоки
+# обрабатывают запросы параллельно), worker — Celery (одна задача на процесс)
+PROCESS_ROLE = env("PROCESS_ROLE", "web")
+# Перед выдачей соединения (из пула или постоянного) проверяется, что оно живо
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+DB_POOL = env.bool("DB_POOL", False)
+if DB_POOL:
+    # Пул psycopg 3 (нужен пакет psycopg-pool), размер — на процесс
+    _pool_sizes = {"web": (1, 4), "worker": (1, 2)}[PROCESS_ROLE]
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": env.int("DB_POOL_MIN_SIZE", _pool_sizes[0]),
+            "max_size": env.int("DB_POOL_MAX_SIZE", _pool_sizes[1]),
+            "timeout": env.int("DB_POOL_TIMEOUT", 10),
+            "max_idle": env.int("DB_POOL_MAX_IDLE", 300),
+        }
+    }
+else:
+    # Без пула — постоянные соединения, живущие DB_CONN_MAX_AGE секунд
+    DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", 60)
+
+# Реплики для чтения (config.db_router): хосты через запятую в формате host[:port].
+# Безопасные запросы API читают с реплик, запись и недавно писавшие пользователи
+# (REPLICA_PIN_SECONDS секунд) — в основную БД. DB_REPLICA_NAME позволяет
+# проверить маршрутизацию локально на второй базе того же сервера
+DATABASE_REPLICAS = []
+for _i, _host in enumerate(env.list("DB_REPLICA_HOSTS", [])):
+    _host, _, _port = _host.partition(":")
+    DATABASES[f"replica_{_i}"] = {
+        **copy.deepcopy(DATABASES["default"]),
+        "NAME": env("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "HOST": _host,
+        "PORT": _port or DATABASES["default"]["PORT"],
+        # В тестах реплика — то же соединение, что и основная БД
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{_i}")
+DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", 10)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -99,6 +152,37 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
 AUTH_USER_MODEL = "users.User"
 
+# Алгоритм хэширования новых паролей: pbkdf2 (по умолчанию), argon2 (нужна
+# библиотека argon2-cffi) или bcrypt (нужна библиотека bcrypt). Остальные
+# алгоритмы остаются в списке для проверки уже сохранённых хэшей; при входе
+# пользователя хэш пересчитывается выбранным алгоритмом.
+# Сравнить алгоритмы: python manage.py benchmark_password_hashers
+PASSWORD_HASHER = env("PASSWORD_HASHER", "pbkdf2")
+_PASSWORD_HASHERS = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "argon2": "users.hashers.TunedArgon2PasswordHasher",
+    "bcrypt": "users.hashers.TunedBCryptSHA256PasswordHasher",
+}
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHER],
+    *(path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+# Параметры Argon2id (по умолчанию — рекомендации OWASP: 19 МиБ, 2 прохода)
+ARGON2_TIME_COST = env.int("ARGON2_TIME_COST", 2)
+ARGON2_MEMORY_COST = env.int("ARGON2_MEMORY_COST", 19456)
+ARGON2_PARALLELISM = env.int("ARGON2_PARALLELISM", 1)
+
+# Число раундов bcrypt (стоимость растёт как 2 ** rounds)
+BCRYPT_ROUNDS = env.int("BCRYPT_ROUNDS", 12)
+
+# Размер пула потоков для хэширования паролей в одном процессе
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", 2)
+
 CACHE_ENABLED = env(
     "CACHE_ENABLED",
     False,
@@ -111,13 +195,21 @@ if CACHE_ENABLED:
         }
     }
 
+# Время жизни закэшированных ответов API курсов и уроков (при CACHE_ENABLED)
+COURSES_CACHE_TIMEOUT = env.int("COURSES_CACHE_TIMEOUT", 300)
+
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "media/"
 
+# Миниатюры превью курсов, уроков и аватаров: имя размера -> наибольшая
+# сторона в пикселях. Создаются задачей Celery после загрузки изображения
+THUMBNAIL_SIZES = {"small": 160, "medium": 480}
+THUMBNAIL_QUALITY = env.int("THUMBNAIL_QUALITY", 80)
+
 # Настройки JWT-токенов
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -134,6 +226,10 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# Время жизни пользователя в кэше аутентификации: Redis и процессный кэш
+AUTH_USER_CACHE_TIMEOUT = env.int("AUTH_USER_CACHE_TIMEOUT", 60)
+AUTH_USER_LOCAL_CACHE_TIMEOUT = env.int("AUTH_USER_LOCAL_CACHE_TIMEOUT", 5)
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Online Training Platform API",
     "DESCRIPTION": "API documentation for the Online Training Platform",
@@ -143,7 +239,26 @@ SPECTACULAR_SETTINGS = {
 
 MODERATOR_GROUP_NAME = "Модераторы"
 
+# Количество последних платежей в профиле пользователя
+PROFILE_PAYMENTS_LIMIT = env.int("PROFILE_PAYMENTS_LIMIT", 5)
+
+# Время жизни закэшированных групп пользователя (при CACHE_ENABLED)
+USER_ROLES_CACHE_TIMEOUT = env.int("USER_ROLES_CACHE_TIMEOUT", 300)
+
 STRIPE_API_KEY = env("STRIPE_API_KEY", "fallback-secret-key-if-not-set")
+STRIPE_WEBHOOK_SECRET = env("STRIPE_WEBHOOK_SECRET", "")
+# Асинхронный клиент Stripe (async-представления оплаты под ASGI): таймауты
+# в секундах и пул соединений процесса — столько запросов к Stripe
+# выполняются одновременно, остальные ждут свободное соединение
+STRIPE_TIMEOUT = env.int("STRIPE_TIMEOUT", 20)
+STRIPE_CONNECT_TIMEOUT = env.int("STRIPE_CONNECT_TIMEOUT", 5)
+STRIPE_MAX_CONNECTIONS = env.int("STRIPE_MAX_CONNECTIONS", 200)
+STRIPE_MAX_KEEPALIVE_CONNECTIONS = env.int("STRIPE_MAX_KEEPALIVE_CONNECTIONS", 50)
+
+# Статус платежа отдаётся из БД (обновляется вебхуком Stripe) и кэшируется на
+# несколько секунд; живой запрос в Stripe — только для давно ожидающих платежей
+PAYMENT_STATUS_CACHE_TIMEOUT = env.int("PAYMENT_STATUS_CACHE_TIMEOUT", 5)
+PAYMENT_STATUS_STALE_AFTER = env.int("PAYMENT_STATUS_STALE_AFTER", 60)
 
 # URL-адрес брокера сообщений
 CELERY_BROKER_URL = env(
@@ -168,4 +283,13 @@ CELERY_RESULT_SERIALIZER = "json"
 
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 
+# Размер пачки при деактивации неактивных пользователей
+DEACTIVATE_USERS_BATCH_SIZE = env.int("DEACTIVATE_USERS_BATCH_SIZE", 1000)
+
+# Количество адресатов в одной подзадаче рассылки об обновлении курса
+COURSE_UPDATE_EMAIL_BATCH_SIZE = env.int("COURSE_UPDATE_EMAIL_BATCH_SIZE", 500)
+
+# Окно (в секундах), в течение которого обновления курса схлопываются в одну рассылку
+COURSE_UPDATE_EMAIL_DEBOUNCE = env.int("COURSE_UPDATE_EMAIL_DEBOUNCE", 60)
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -0,0 +1,22 @@
+class QueryBudgetTestMixin:
+    """
+    Проверки метрик запроса, записанных RequestMetricsMiddleware в ответ
+    тестового клиента.
+    """
+
+    def assertQueryBudget(self, response, budget=None):
+        """
+        Проверяет, что запрос уложился в бюджет SQL-запросов: явно переданный
+        или объявленный представлением (query_budget).
+        """
+        metrics = response.request_metrics
+        if budget is None:
+            budget = metrics.query_budget
+        self.assertIsNotNone(
+            budget, f"Представление {metrics.view_name} не объявляет query_budget"
+        )
+        self.assertLessEqual(
+            metrics.queries,
+            budget,
+            f"{metrics.view_name}: {metrics.queries} SQL-запросов при бюджете {budget}",
+        )
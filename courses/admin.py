@@ -1,11 +1,11 @@
 from django.contrib import admin
 
-from .models import Course, Lesson, Subscription
+from .models import Course, Lesson, StripePrice, Subscription
 
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ("title", "owner")
+    list_display = ("title", "owner", "lessons_count", "subscribers_count")
     list_filter = ("owner",)
     search_fields = ("title", "description", "owner__email")
 
@@ -22,3 +22,10 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ("user", "course")
     list_filter = ("course", "user")
     search_fields = ("user__email", "course__title")
+
+
+@admin.register(StripePrice)
+class StripePriceAdmin(admin.ModelAdmin):
+    list_display = ("course", "lesson", "amount", "currency", "stripe_price_id")
+    list_filter = ("currency",)
+    search_fields = ("course__title", "lesson__title", "stripe_price_id")
@@ -0,0 +1,293 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from config.db_router import primary_reads
+
+LIST_VERSION_KEY = "courses:cache:{name}:list_version"
+
+
+def list_version_key(name):
+    return LIST_VERSION_KEY.format(name=name)
+
+
+def get_list_version(name):
+    version = cache.get(list_version_key(name))
+    if version is None:
+        cache.add(list_version_key(name), 1, timeout=None)
+        version = cache.get(list_version_key(name), 1)
+    return version
+
+
+def bump_list_versions(*names):
+    """
+    Делает недействительными закэшированные списки (курсов, уроков).
+    """
+    if not settings.CACHE_ENABLED:
+        return
+    for name in names:
+        cache.add(list_version_key(name), 1, timeout=None)
+        cache.incr(list_version_key(name))
+
+
+def detail_cache_key(name, pk, version):
+    # Версия объекта — его updated_at и счётчики, поэтому изменённый объект
+    # получает новый ключ
+    updated_at, *counters = version
+    return ":".join(
+        str(part)
+        for part in ("courses:cache", name, pk, updated_at.timestamp(), *counters)
+    )
+
+
+def list_cache_key(name, scope, query_params):
+    query = hashlib.md5(query_params.urlencode().encode()).hexdigest()
+    return f"courses:cache:{name}:list:{get_list_version(name)}:{scope}:{query}"
+
+
+def subscriptions_cache_key(user_id):
+    return f"courses:cache:subscriptions:{user_id}"
+
+
+def get_subscribed_course_ids(user):
+    """
+    Возвращает множество ID курсов, на которые подписан пользователь.
+    """
+    key = subscriptions_cache_key(user.pk)
+    course_ids = cache.get(key) if settings.CACHE_ENABLED else None
+    if course_ids is None:
+        course_ids = list(user.subscription_set.values_list("course_id", flat=True))
+        if settings.CACHE_ENABLED:
+            cache.set(key, course_ids, settings.COURSES_CACHE_TIMEOUT)
+    return set(course_ids)
+
+
+def invalidate_subscriptions(user_id):
+    if settings.CACHE_ENABLED:
+        cache.delete(subscriptions_cache_key(user_id))
+
+
+class ObjectVersionMixin:
+    """
+    Версия объекта одним лёгким запросом в пределах доступных пользователю
+    объектов. Результат запоминается на время запроса.
+
+    Версия — кортеж значений version_fields: updated_at и счётчики, которые
+    обновляются через F() без изменения updated_at.
+    """
+
+    version_fields = ("updated_at",)
+
+    def get_scope_queryset(self):
+        """
+        Queryset объектов, доступных пользователю, без аннотаций.
+        """
+        raise NotImplementedError
+
+    def get_object_version(self):
+        if not hasattr(self, "_object_version"):
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            self._object_version = (
+                self.get_scope_queryset()
+                .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+                .values_list(*self.version_fields)
+                .first()
+            )
+        return self._object_version
+
+
+class CachedReadMixin(ObjectVersionMixin):
+    """
+    Кэширует сериализованные ответы list/retrieve в общем кэше.
+
+    Ключ объекта содержит его версию, ключ списка — версию списков,
+    которую увеличивают сигналы post_save/post_delete. Поля, зависящие от
+    пользователя или часто меняющиеся счётчики, не кэшируются и подставляются
+    в personalize(); они же не входят в ключ объекта.
+    Кэш заполняется из основной БД: данные отстающей реплики остались бы
+    в нём под новой версией до следующего изменения.
+    """
+
+    cache_name = None
+    personal_fields = ()
+
+    def get_cache_scope(self):
+        user = self.request.user
+        return "all" if user.is_moderator else f"user:{user.pk}"
+
+    def personalize(self, items):
+        return items
+
+    def _cacheable(self, data):
+        items = (
+            data["results"] if isinstance(data, dict) and "results" in data else data
+        )
+        for item in items if isinstance(items, list) else [items]:
+            for field in self.personal_fields:
+                item.pop(field, None)
+        return data
+
+    def _personalized_response(self, data):
+        if isinstance(data, dict) and "results" in data:
+            self.personalize(data["results"])
+        elif isinstance(data, list):
+            self.personalize(data)
+        else:
+            self.personalize([data])
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CACHE_ENABLED:
+            return super().list(request, *args, **kwargs)
+
+        key = list_cache_key(
+            self.cache_name, self.get_cache_scope(), request.query_params
+        )
+        data = cache.get(key)
+        if data is None:
+            with primary_reads():
+                data = self._cacheable(super().list(request, *args, **kwargs).data)
+            cache.set(key, data, settings.COURSES_CACHE_TIMEOUT)
+        return self._personalized_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.CACHE_ENABLED:
+            return super().retrieve(request, *args, **kwargs)
+
+        version = self.get_object_version()
+        if version is None:
+            # Объекта нет или он недоступен — стандартный ответ 404
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        shared_version = [
+            value
+            for field, value in zip(self.version_fields, version)
+            if field not in self.personal_fields
+        ]
+        key = detail_cache_key(
+            self.cache_name, kwargs[lookup_url_kwarg], shared_version
+        )
+        data = cache.get(key)
+        if data is None:
+            with primary_reads():
+                data = self._cacheable(super().retrieve(request, *args, **kwargs).data)
+            cache.set(key, data, settings.COURSES_CACHE_TIMEOUT)
+        return self._personalized_response(data)
+
+
+class ConditionalGetMixin(ObjectVersionMixin):
+    """
+    Поддержка условных GET-запросов (If-None-Match / If-Modified-Since).
+
+    Валидаторы считаются по версии объекта: для объекта — по ней самой, для
+    списка — по версиям объектов текущей страницы (одним запросом по индексу,
+    без COUNT по всем доступным объектам) и версии закэшированных списков.
+    Если клиент уже имеет актуальную версию, возвращается 304 без сериализации.
+
+    Last-Modified отдаётся только для объектов, версия которых — один
+    updated_at. Удаление объекта, смена подписок и счётчики его не меняют,
+    поэтому списки и объекты со счётчиками отдаются только с ETag.
+    """
+
+    def get_etag_extra(self):
+        """
+        Данные пользователя, от которых зависит ответ (кроме самих объектов).
+        """
+        return ""
+
+    def _make_etag(self, *parts):
+        raw = ":".join(
+            str(part) for part in (*parts, self.request.user.pk, self.get_etag_extra())
+        )
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def _conditional_response(self, request, etag, updated_at, handler):
+        last_modified = updated_at.timestamp() if updated_at else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler()
+
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        # Клиент может хранить ответ, но обязан перепроверять его по ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _page_versions(self, queryset):
+        """
+        Версии объектов текущей страницы списка и признаки соседних страниц,
+        от которых зависят ссылки next/previous. None — страницу нельзя
+        определить без подсчёта всех объектов (например, ?page=last).
+        """
+        fields = ("pk", *self.version_fields)
+        paginator = self.paginator
+        if isinstance(paginator, CursorPagination):
+            ordering = paginator.get_ordering(self.request, queryset, self)
+            # Словари: курсор берёт из них поля сортировки
+            page = paginator.paginate_queryset(
+                queryset.values(*fields, *(field.lstrip("-") for field in ordering)),
+                self.request,
+                view=self,
+            )
+            rows = [tuple(row[field] for field in fields) for row in page]
+            return rows, paginator.has_next, paginator.has_previous
+
+        page_size = paginator.get_page_size(self.request) if paginator else None
+        if page_size is None:
+            return list(queryset.values_list(*fields))
+        try:
+            number = int(self.request.query_params.get(paginator.page_query_param, 1))
+        except ValueError:
+            return None
+        if number < 1:
+            return None
+        # Лишняя строка показывает, есть ли следующая страница
+        start = (number - 1) * page_size
+        return list(queryset.values_list(*fields)[start : start + page_size + 1])
+
+    def list(self, request, *args, **kwargs):
+        page_versions = self._page_versions(
+            self.filter_queryset(self.get_scope_queryset())
+        )
+        if page_versions is None:
+            return super().list(request, *args, **kwargs)
+
+        # Версия списков меняется и при удалении объектов с других страниц,
+        # от которых зависит общее количество (count)
+        list_version = (
+            get_list_version(self.cache_name)
+            if settings.CACHE_ENABLED and getattr(self, "cache_name", None)
+            else None
+        )
+        etag = self._make_etag(
+            "list", page_versions, list_version, request.query_params.urlencode()
+        )
+        return self._conditional_response(
+            request,
+            etag,
+            None,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        version = self.get_object_version()
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        etag = self._make_etag("detail", self.kwargs[lookup_url_kwarg], *version)
+        return self._conditional_response(
+            request,
+            etag,
+            version[0] if len(version) == 1 else None,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+        )
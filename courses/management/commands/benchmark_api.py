@@ -0,0 +1,158 @@
+import json
+import math
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import User
+
+
+def percentile(values, pct):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the main API endpoints in-process and reports p50/p95/p99 "
+        "latency and SQL queries per request. Changes are rolled back."
+    )
+
+    endpoints = (
+        "course-list",
+        "lesson-list",
+        "payment-list",
+        "subscription-toggle",
+        "register",
+        "login",
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=30, help="Requests per endpoint"
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=3, help="Unmeasured requests per endpoint"
+        )
+        parser.add_argument(
+            "--email", help="User to benchmark as (default: author of most courses)"
+        )
+        parser.add_argument(
+            "--password", default="loadtest123", help="Password of that user (login)"
+        )
+        parser.add_argument("--endpoints", nargs="+", choices=self.endpoints)
+        parser.add_argument("--json", dest="json_path", help="Save results to a file")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be positive")
+        self.user = self.get_user(options["email"])
+        self.password = options["password"]
+        self.course_id = (
+            self.user.courses.values_list("id", flat=True).order_by("id").first()
+        )
+        if self.course_id is None:
+            raise CommandError(f"{self.user.email} has no courses to subscribe to")
+
+        self.client = APIClient()
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        results = {}
+        # Регистрации и подписки откатываются — повторные прогоны сопоставимы
+        with transaction.atomic():
+            for name in options["endpoints"] or self.endpoints:
+                request = getattr(self, f"request_{name.replace('-', '_')}")
+                for i in range(options["warmup"]):
+                    request(f"warmup-{i}")
+                results[name] = self.measure(request, options["requests"])
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{'endpoint':<22}{'req':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}{'max q':>7}  status"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<22}{result['requests']:>5}{result['p50_ms']:>9.1f}"
+                f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                f"{result['queries_avg']:>9.1f}{result['queries_max']:>7}  "
+                f"{','.join(map(str, result['statuses']))}"
+            )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump(results, file, indent=2)
+
+    def get_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f"User {email} does not exist")
+            return user
+        user = (
+            User.objects.annotate(courses_total=Count("courses"))
+            .order_by("-courses_total", "id")
+            .first()
+        )
+        if user is None:
+            raise CommandError("No users found, run generate_data first")
+        return user
+
+    def measure(self, request, count):
+        durations = []
+        queries = []
+        statuses = set()
+        for i in range(count):
+            started = time.perf_counter()
+            response = request(str(i))
+            durations.append((time.perf_counter() - started) * 1000)
+            # Количество запросов считает RequestMetricsMiddleware
+            queries.append(response.request_metrics.queries)
+            statuses.add(response.status_code)
+        return {
+            "requests": count,
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+            "p99_ms": percentile(durations, 99),
+            "queries_avg": sum(queries) / count,
+            "queries_max": max(queries),
+            "statuses": sorted(statuses),
+        }
+
+    def request_course_list(self, key):
+        return self.client.get("/courses/")
+
+    def request_lesson_list(self, key):
+        return self.client.get("/lessons/")
+
+    def request_payment_list(self, key):
+        return self.client.get("/payments/")
+
+    def request_subscription_toggle(self, key):
+        return self.client.post(f"/courses/{self.course_id}/subscription/")
+
+    def request_register(self, key):
+        return APIClient().post(
+            "/register/",
+            {
+                "email": f"bench-{uuid.uuid4().hex[:8]}-{key}@example.com",
+                "password": "benchmark123",
+                "phone": "+79000000000",
+                "city": "Москва",
+            },
+            format="json",
+        )
+
+    def request_login(self, key):
+        return APIClient().post(
+            "/login/",
+            {"email": self.user.email, "password": self.password},
+            format="json",
+        )
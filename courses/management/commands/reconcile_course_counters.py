@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Recalculates lessons_count and subscribers_count of courses in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Courses per UPDATE"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        started = time.monotonic()
+
+        # Пачки по диапазонам id: каждая — один короткий UPDATE
+        reconciled = 0
+        last_id = 0
+        while True:
+            batch_ids = list(
+                Course.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not batch_ids:
+                break
+
+            reconciled += Course.objects.filter(
+                id__gt=last_id, id__lte=batch_ids[-1]
+            ).reconcile_counters()
+            last_id = batch_ids[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Counters reconciled for {reconciled} courses "
+                f"in {time.monotonic() - started:.3f} s"
+            )
+        )
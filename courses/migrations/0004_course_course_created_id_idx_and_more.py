@@ -0,0 +1,41 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:18
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("courses", "0003_course_created_at_course_updated_at_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="course",
+            index=models.Index(
+                fields=["created_at", "id"], name="course_created_id_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="course",
+            index=models.Index(
+                fields=["owner", "created_at", "id"], name="course_owner_created_id_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="lesson",
+            index=models.Index(
+                fields=["created_at", "id"], name="lesson_created_id_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="lesson",
+            index=models.Index(
+                fields=["owner", "created_at", "id"], name="lesson_owner_created_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0005_stripeprice"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="lessons_count",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="Количество уроков"
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="subscribers_count",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="Количество подписчиков"
+            ),
+        ),
+        # Начальные значения счётчиков для существующих курсов
+        migrations.RunSQL(
+            """
+            UPDATE courses_course SET
+                lessons_count = (
+                    SELECT count(*) FROM courses_lesson
+                    WHERE courses_lesson.course_id = courses_course.id
+                ),
+                subscribers_count = (
+                    SELECT count(*) FROM courses_subscription
+                    WHERE courses_subscription.course_id = courses_course.id
+                )
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
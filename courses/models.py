@@ -1,4 +1,45 @@
-from django.db import models
+from collections import Counter
+
+from django.db import connection, models
+from django.db.models import (
+    DEFERRED,
+    Case,
+    Count,
+    F,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import bump_list_versions, invalidate_subscriptions
+
+
+class CourseQuerySet(models.QuerySet):
+    def reconcile_counters(self):
+        """
+        Пересчитывает lessons_count и subscribers_count по фактическим урокам
+        и подпискам одним UPDATE. Возвращает количество обработанных курсов.
+        """
+
+        def count_for_course(model):
+            return Coalesce(
+                Subquery(
+                    model.objects.filter(course=OuterRef("pk"))
+                    .order_by()
+                    .values("course")
+                    .annotate(count=Count("pk"))
+                    .values("count")
+                ),
+                0,
+            )
+
+        return self.update(
+            lessons_count=count_for_course(Lesson),
+            subscribers_count=count_for_course(Subscription),
+        )
 
 
 class Course(models.Model):
@@ -18,6 +59,28 @@ class Course(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Счётчики меняются только атомарными F()-обновлениями при создании и
+    # удалении уроков и подписок; сверка — команда reconcile_course_counters
+    lessons_count = models.IntegerField(
+        default=0, editable=False, verbose_name="Количество уроков"
+    )
+    subscribers_count = models.IntegerField(
+        default=0, editable=False, verbose_name="Количество подписчиков"
+    )
+
+    objects = CourseQuerySet.as_manager()
+
+    COUNTER_FIELDS = ("lessons_count", "subscribers_count")
+
+    def save(self, *args, **kwargs):
+        # Обычное сохранение не перезаписывает счётчики устаревшими значениями
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -25,6 +88,61 @@ class Course(models.Model):
     class Meta:
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
+        indexes = [
+            # Курсорная пагинация (ORDER BY created_at, id)
+            models.Index(fields=["created_at", "id"], name="course_created_id_idx"),
+            models.Index(
+                fields=["owner", "created_at", "id"],
+                name="course_owner_created_id_idx",
+            ),
+        ]
+
+
+class LessonQuerySet(models.QuerySet):
+    """
+    Массовые операции с уроками, обновляющие время изменения их курсов
+    одним UPDATE на пачку.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        lessons = super().bulk_create(objs, *args, **kwargs)
+        added = Counter(lesson.course_id for lesson in lessons if lesson.course_id)
+        self._touch_courses(lessons, added=added)
+        return lessons
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        # auto_now не срабатывает в bulk_update — проставляем время сами
+        now = timezone.now()
+        for lesson in objs:
+            lesson.updated_at = now
+        moved_from = set()
+        if "course" in fields:
+            # Уроки могут сменить курс — запоминаем прежние курсы для пересчёта
+            moved_from = set(
+                self.filter(pk__in=[lesson.pk for lesson in objs])
+                .exclude(course=None)
+                .values_list("course_id", flat=True)
+            )
+        updated = super().bulk_update(objs, {*fields, "updated_at"}, *args, **kwargs)
+        self._touch_courses(objs, now)
+        if "course" in fields:
+            course_ids = moved_from | {lesson.course_id for lesson in objs}
+            Course.objects.filter(id__in=course_ids).reconcile_counters()
+        return updated
+
+    def _touch_courses(self, lessons, timestamp=None, added=None):
+        course_ids = {lesson.course_id for lesson in lessons if lesson.course_id}
+        if course_ids:
+            fields = {"updated_at": timestamp or timezone.now()}
+            if added:
+                # Счётчик каждого курса увеличивается на число его новых уроков
+                fields["lessons_count"] = F("lessons_count") + Case(
+                    *(When(pk=pk, then=Value(n)) for pk, n in added.items()),
+                    default=Value(0),
+                )
+            Course.objects.filter(id__in=course_ids).update(**fields)
+        # Массовые операции не отправляют post_save — сбрасываем кэш списков сами
+        bump_list_versions("course", "lesson")
 
 
 class Lesson(models.Model):
@@ -54,18 +172,165 @@ class Lesson(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = LessonQuerySet.as_manager()
+
+    # Курс урока на момент загрузки из БД — для счётчиков при переносе урока
+    _loaded_course_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Через __dict__: обращение к отложенному полю (only/defer) загрузило
+        # бы его отдельным запросом для каждой строки
+        instance._loaded_course_id = instance.__dict__.get("course_id", DEFERRED)
+        return instance
+
     def save(self, *args, **kwargs):
-        # При обновлении урока — обновляем время у курса
+        # При обновлении урока — обновляем время у курса (без загрузки курса)
+        adding = self._state.adding
+        previous_course_id = None if adding else self._loaded_course_id
+        if previous_course_id is DEFERRED:
+            # Урок загружен без course_id — прежний курс берём из БД
+            previous_course_id = (
+                Lesson.objects.filter(pk=self.pk)
+                .values_list("course_id", flat=True)
+                .first()
+            )
         super().save(*args, **kwargs)
-        self.course.updated_at = self.updated_at
-        self.course.save(update_fields=["updated_at"])
+        moved = previous_course_id != self.course_id
+
+        if moved and previous_course_id is not None:
+            Course.objects.filter(pk=previous_course_id).update(
+                updated_at=self.updated_at, lessons_count=F("lessons_count") - 1
+            )
+        if self.course_id is not None:
+            fields = {"updated_at": self.updated_at}
+            if moved:
+                fields["lessons_count"] = F("lessons_count") + 1
+            Course.objects.filter(pk=self.course_id).update(**fields)
+        self._loaded_course_id = self.course_id
 
     def __str__(self):
+        if self.course_id is None:
+            return self.title
         return f"{self.course.title} - {self.title}"
 
     class Meta:
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
+        indexes = [
+            # Курсорная пагинация (ORDER BY created_at, id)
+            models.Index(fields=["created_at", "id"], name="lesson_created_id_idx"),
+            models.Index(
+                fields=["owner", "created_at", "id"],
+                name="lesson_owner_created_id_idx",
+            ),
+        ]
+
+
+class SubscriptionQuerySet(models.QuerySet):
+    """
+    Подписка и отписка одним SQL-запросом без гонок между проверкой и записью.
+    Тот же запрос обновляет счётчик подписчиков курса. Запросы идут в обход
+    сигналов, поэтому кэш подписок сбрасывается здесь.
+    """
+
+    def toggle(self, user_id, course_id):
+        """
+        Удаляет подписку, если она есть, иначе создаёт. Возвращает True, если
+        пользователь подписан после запроса, False — если отписан, и None,
+        если курса не существует.
+        """
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH deleted AS (
+                    DELETE FROM {table}
+                    WHERE user_id = %(user_id)s AND course_id = %(course_id)s
+                    RETURNING id
+                ), inserted AS (
+                    INSERT INTO {table} (user_id, course_id)
+                    SELECT %(user_id)s, id FROM {Course._meta.db_table}
+                    WHERE id = %(course_id)s
+                        AND NOT EXISTS (SELECT 1 FROM deleted)
+                    ON CONFLICT (user_id, course_id) DO NOTHING
+                    RETURNING id
+                ), counted AS (
+                    UPDATE {Course._meta.db_table}
+                    SET subscribers_count = subscribers_count
+                        + (SELECT count(*) FROM inserted)
+                        - (SELECT count(*) FROM deleted)
+                    WHERE id = %(course_id)s
+                )
+                SELECT
+                    EXISTS (SELECT 1 FROM deleted),
+                    EXISTS (
+                        SELECT 1 FROM {Course._meta.db_table}
+                        WHERE id = %(course_id)s
+                    )
+                """,
+                {"user_id": user_id, "course_id": course_id},
+            )
+            deleted, course_exists = cursor.fetchone()
+
+        if deleted:
+            invalidate_subscriptions(user_id)
+            return False
+        if not course_exists:
+            return None
+        # Подписка создана (или её одновременно создал параллельный запрос)
+        invalidate_subscriptions(user_id)
+        return True
+
+    def bulk_subscribe(self, user_id, course_ids):
+        """Подписывает на существующие курсы из списка, возвращает id курсов, на которые подписал."""
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH inserted AS (
+                    INSERT INTO {table} (user_id, course_id)
+                    SELECT %s, id FROM {Course._meta.db_table} WHERE id = ANY(%s)
+                    ON CONFLICT (user_id, course_id) DO NOTHING
+                    RETURNING course_id
+                ), counted AS (
+                    UPDATE {Course._meta.db_table}
+                    SET subscribers_count = subscribers_count + 1
+                    WHERE id IN (SELECT course_id FROM inserted)
+                )
+                SELECT course_id FROM inserted
+                """,
+                [user_id, list(course_ids)],
+            )
+            changed = sorted(row[0] for row in cursor.fetchall())
+        if changed:
+            invalidate_subscriptions(user_id)
+        return changed
+
+    def bulk_unsubscribe(self, user_id, course_ids):
+        """Отписывает от курсов из списка, возвращает id курсов, от которых отписал."""
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH deleted AS (
+                    DELETE FROM {table}
+                    WHERE user_id = %s AND course_id = ANY(%s)
+                    RETURNING course_id
+                ), counted AS (
+                    UPDATE {Course._meta.db_table}
+                    SET subscribers_count = subscribers_count - 1
+                    WHERE id IN (SELECT course_id FROM deleted)
+                )
+                SELECT course_id FROM deleted
+                """,
+                [user_id, list(course_ids)],
+            )
+            changed = sorted(row[0] for row in cursor.fetchall())
+        if changed:
+            invalidate_subscriptions(user_id)
+        return changed
 
 
 class Subscription(models.Model):
@@ -74,6 +339,8 @@ class Subscription(models.Model):
     )
     course = models.ForeignKey("Course", on_delete=models.CASCADE, verbose_name="Курс")
 
+    objects = SubscriptionQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.user.email} -> {self.course.title}"
 
@@ -84,3 +351,53 @@ class Subscription(models.Model):
             "user",
             "course",
         )  # Один пользователь — одна подписка на курс
+
+
+class StripePrice(models.Model):
+    """
+    Цена в Stripe, созданная для курса или урока, чтобы не создавать
+    продукт и цену заново при каждой оплате.
+    """
+
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="stripe_prices",
+        verbose_name="Курс",
+    )
+    lesson = models.ForeignKey(
+        Lesson,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="stripe_prices",
+        verbose_name="Урок",
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Сумма")
+    currency = models.CharField(max_length=3, default="rub", verbose_name="Валюта")
+    stripe_product_id = models.CharField(
+        max_length=255, verbose_name="ID продукта в Stripe"
+    )
+    stripe_price_id = models.CharField(max_length=255, verbose_name="ID цены в Stripe")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    def __str__(self):
+        return f"{self.course or self.lesson} - {self.amount} {self.currency}"
+
+    class Meta:
+        verbose_name = "Цена в Stripe"
+        verbose_name_plural = "Цены в Stripe"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course", "amount", "currency"],
+                condition=models.Q(course__isnull=False),
+                name="unique_course_stripe_price",
+            ),
+            models.UniqueConstraint(
+                fields=["lesson", "amount", "currency"],
+                condition=models.Q(lesson__isnull=False),
+                name="unique_lesson_stripe_price",
+            ),
+        ]
@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class LessonPagination(PageNumberPagination):
@@ -11,3 +11,55 @@ class CoursePagination(PageNumberPagination):
     page_size = 2  # Количество курсов на странице
     page_size_query_param = "page_size"
     max_page_size = 20  # Максимальное количество на странице
+
+
+class PaymentPagination(PageNumberPagination):
+    page_size = 20  # Количество платежей на странице
+    page_size_query_param = "page_size"
+    max_page_size = 100  # Максимальное количество на странице
+
+
+class LessonCursorPagination(CursorPagination):
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 50
+    ordering = ("created_at", "id")  # Покрыто индексом lesson_created_id_idx
+
+
+class CourseCursorPagination(CursorPagination):
+    page_size = 2
+    page_size_query_param = "page_size"
+    max_page_size = 20
+    ordering = ("created_at", "id")  # Покрыто индексом course_created_id_idx
+
+
+class PaymentCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    # Используется порядок вью (OrderingFilter), по умолчанию -payment_date, -id
+    ordering = ("-payment_date", "-id")
+
+
+class CursorModePaginationMixin:
+    """
+    Включает курсорную пагинацию по параметру запроса ?pagination=cursor.
+
+    Курсорная пагинация не выполняет COUNT(*) и OFFSET, поэтому глубокие
+    страницы отдаются так же быстро, как первая.
+    """
+
+    cursor_pagination_class = None
+    pagination_mode_query_param = "pagination"
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            mode = self.request.query_params.get(self.pagination_mode_query_param)
+            if mode == "cursor" and self.cursor_pagination_class is not None:
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -16,7 +16,7 @@ class IsModeratorOrReadOnly(BasePermission):
             return True
 
         # Проверяем, состоит ли пользователь в группе "Модераторы"
-        if request.user.groups.filter(name="Модераторы").exists():
+        if request.user.is_moderator:
             return True
 
         # Остальным пользователям (не модераторам) запрещаем
@@ -1,17 +1,76 @@
 from rest_framework import serializers
-from rest_framework.fields import SerializerMethodField
 
 from users.models import Payment
 
 from .models import Course, Lesson, Subscription
+from .services.thumbnail_service import thumbnail_urls
 from .validators import YouTubeLinkValidator
 
 
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Связанный объект по первичному ключу. При массовой валидации объекты
+    берутся из словаря, заранее загруженного LessonListSerializer, — без
+    отдельного запроса на каждый элемент списка.
+    """
+
+    prefetched = None
+
+    def to_internal_value(self, data):
+        if self.prefetched is None or isinstance(data, bool):
+            return super().to_internal_value(data)
+        try:
+            return self.prefetched[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class LessonListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # Курсы (и владельцы) всех уроков загружаются одним запросом на поле
+        fields = [
+            field
+            for field in self.child.fields.values()
+            if isinstance(field, PrefetchedPrimaryKeyRelatedField)
+            and not field.read_only
+        ]
+        items = data if isinstance(data, list) else []
+        for field in fields:
+            pks = set()
+            for item in items:
+                value = item.get(field.field_name) if isinstance(item, dict) else None
+                if value is not None and not isinstance(value, bool):
+                    try:
+                        pks.add(int(value))
+                    except (TypeError, ValueError):
+                        pass  # Ошибку типа сообщит само поле
+            field.prefetched = field.get_queryset().in_bulk(pks) if pks else {}
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields:
+                field.prefetched = None
+
+    def create(self, validated_data):
+        # Один INSERT на все уроки и один UPDATE их курсов
+        lessons = [Lesson(**attrs) for attrs in validated_data]
+        return Lesson.objects.bulk_create(lessons)
+
+
 class LessonSerializer(serializers.ModelSerializer):
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+    preview_thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = Lesson
         fields = "__all__"
         validators = [YouTubeLinkValidator(field="video_url")]
+        list_serializer_class = LessonListSerializer
+
+    def get_preview_thumbnails(self, instance):
+        return thumbnail_urls(instance.preview, self.context.get("request"))
 
 
 class LessonMiniSerializer(serializers.ModelSerializer):
@@ -21,18 +80,20 @@ class LessonMiniSerializer(serializers.ModelSerializer):
 
 
 class CourseSerializer(serializers.ModelSerializer):
-    lessons_count = SerializerMethodField()
     lessons = LessonMiniSerializer(many=True, read_only=True)
     is_subscribed = serializers.SerializerMethodField()
+    preview_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
         fields = "__all__"
 
-    def get_lessons_count(self, instance):
-        return instance.lessons.count()
+    def get_preview_thumbnails(self, instance):
+        return thumbnail_urls(instance.preview, self.context.get("request"))
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return Subscription.objects.filter(user=request.user, course=obj).exists()
@@ -43,3 +104,10 @@ class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = "__all__"
+
+
+class SubscriptionBulkSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=("subscribe", "unsubscribe"))
+    course_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100
+    )
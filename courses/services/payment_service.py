@@ -0,0 +1,295 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Tuple
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from users.models import Payment
+
+from ..models import Course, StripePrice
+from .stripe_service import (
+    acreate_checkout_session,
+    acreate_stripe_price,
+    acreate_stripe_product,
+    create_checkout_session,
+    create_stripe_price,
+    create_stripe_product,
+)
+
+logger = logging.getLogger(__name__)
+
+# Процессный LRU-кэш (товар, сумма, валюта) -> ID цены в Stripe
+PRICE_CACHE_SIZE = 1024
+_price_cache = OrderedDict()
+_price_cache_lock = threading.Lock()
+
+
+def _price_cache_get(key):
+    with _price_cache_lock:
+        price_id = _price_cache.get(key)
+        if price_id is not None:
+            _price_cache.move_to_end(key)
+        return price_id
+
+
+def _price_cache_set(key, price_id):
+    with _price_cache_lock:
+        _price_cache[key] = price_id
+        _price_cache.move_to_end(key)
+        while len(_price_cache) > PRICE_CACHE_SIZE:
+            _price_cache.popitem(last=False)
+
+
+def clear_price_cache():
+    with _price_cache_lock:
+        _price_cache.clear()
+
+
+def _release_connections():
+    for connection in connections.all(initialized_only=True):
+        # Соединение с открытой транзакцией (например, в тестах) не трогаем
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+async def release_db_connections():
+    """
+    Возвращает соединения с БД текущего запроса в пул (без пула — закрывает)
+    перед ожиданием Stripe. Иначе async-запрос держал бы соединение всё время
+    ожидания, и сотни одновременных оплат исчерпали бы пул.
+    """
+    await sync_to_async(_release_connections)()
+
+
+async def _run_db(func, *args):
+    """Запрос к БД между обращениями к Stripe: соединение сразу освобождается."""
+    try:
+        return await sync_to_async(func)(*args)
+    finally:
+        await release_db_connections()
+
+
+def _price_lookup(item, currency):
+    item_field = "course" if isinstance(item, Course) else "lesson"
+    return item_field, {item_field: item, "currency": currency}
+
+
+def _find_stripe_price(lookup, amount):
+    """
+    Возвращает (ID цены, None) для уже созданной цены или (None, ID продукта),
+    если товар уже есть в Stripe, но на эту сумму цены ещё нет.
+    """
+    stripe_price = StripePrice.objects.filter(amount=amount, **lookup).first()
+    if stripe_price is not None:
+        return stripe_price.stripe_price_id, None
+    # Продукт создаётся один раз на товар, новые суммы — только новые цены
+    product_id = (
+        StripePrice.objects.filter(**lookup)
+        .values_list("stripe_product_id", flat=True)
+        .first()
+    )
+    return None, product_id
+
+
+def _save_stripe_price(lookup, amount, product_id, price_id):
+    try:
+        with transaction.atomic():
+            stripe_price = StripePrice.objects.create(
+                amount=amount,
+                stripe_product_id=product_id,
+                stripe_price_id=price_id,
+                **lookup,
+            )
+    except IntegrityError:
+        # Цену параллельно создал другой запрос — используем её
+        stripe_price = StripePrice.objects.get(amount=amount, **lookup)
+    return stripe_price.stripe_price_id
+
+
+def get_or_create_stripe_price(item, amount, currency: str = "rub") -> str:
+    """
+    Возвращает ID цены в Stripe для курса или урока, создавая продукт и цену
+    только при первой оплате этого товара на эту сумму.
+    """
+    item_field, lookup = _price_lookup(item, currency)
+    key = (item_field, item.pk, str(amount), currency)
+
+    price_id = _price_cache_get(key)
+    if price_id is not None:
+        return price_id
+
+    price_id, product_id = _find_stripe_price(lookup, amount)
+    if price_id is None:
+        product_id = product_id or create_stripe_product(item.title)
+        price_id = _save_stripe_price(
+            lookup,
+            amount,
+            product_id,
+            create_stripe_price(product_id, int(amount * 100), currency),
+        )
+
+    _price_cache_set(key, price_id)
+    return price_id
+
+
+async def aget_or_create_stripe_price(item, amount, currency: str = "rub") -> str:
+    """
+    То же, что get_or_create_stripe_price, но запросы к Stripe не блокируют
+    поток: они выполняются асинхронным клиентом, а запросы к БД — в потоке
+    через sync_to_async, с освобождением соединения после каждого.
+    """
+    item_field, lookup = _price_lookup(item, currency)
+    key = (item_field, item.pk, str(amount), currency)
+
+    price_id = _price_cache_get(key)
+    if price_id is not None:
+        return price_id
+
+    price_id, product_id = await _run_db(_find_stripe_price, lookup, amount)
+    if price_id is None:
+        product_id = product_id or await acreate_stripe_product(item.title)
+        price_id = await _run_db(
+            _save_stripe_price,
+            lookup,
+            amount,
+            product_id,
+            await acreate_stripe_price(product_id, int(amount * 100), currency),
+        )
+
+    _price_cache_set(key, price_id)
+    return price_id
+
+
+def _payment_item(payment: Payment):
+    return payment.paid_course or payment.paid_lesson
+
+
+def start_checkout(
+    payment: Payment, success_url: str, cancel_url: str
+) -> Tuple[str, str]:
+    """
+    Открывает сессию оплаты в Stripe для уже сохранённого платежа.
+
+    Вызывается вне транзакции, чтобы запросы к Stripe не удерживали соединение
+    с БД. Результат фиксируется переходом статуса платежа: pending при успехе,
+    failed при ошибке Stripe (исключение пробрасывается дальше).
+    """
+    try:
+        price_id = get_or_create_stripe_price(_payment_item(payment), payment.amount)
+        session_id, session_url = create_checkout_session(
+            price_id, success_url=success_url, cancel_url=cancel_url
+        )
+    except stripe.StripeError as e:
+        logger.warning(
+            f"Не удалось создать сессию оплаты для платежа {payment.pk}: {e}"
+        )
+        payment.set_status(Payment.STATUS_FAILED)
+        raise
+
+    payment.set_status(
+        Payment.STATUS_PENDING,
+        stripe_session_id=session_id,
+        stripe_session_url=session_url,
+        stripe_status="unpaid",
+    )
+    return session_id, session_url
+
+
+async def astart_checkout(
+    payment: Payment, success_url: str, cancel_url: str
+) -> Tuple[str, str]:
+    """
+    Асинхронный вариант start_checkout для async-представлений.
+    """
+    # Соединение, занятое при сохранении платежа, освобождается до запросов к Stripe
+    item = await _run_db(_payment_item, payment)
+    try:
+        price_id = await aget_or_create_stripe_price(item, payment.amount)
+        session_id, session_url = await acreate_checkout_session(
+            price_id, success_url=success_url, cancel_url=cancel_url
+        )
+    except stripe.StripeError as e:
+        logger.warning(
+            f"Не удалось создать сессию оплаты для платежа {payment.pk}: {e}"
+        )
+        await sync_to_async(payment.set_status)(Payment.STATUS_FAILED)
+        raise
+
+    await sync_to_async(payment.set_status)(
+        Payment.STATUS_PENDING,
+        stripe_session_id=session_id,
+        stripe_session_url=session_url,
+        stripe_status="unpaid",
+    )
+    return session_id, session_url
+
+
+# Статусы оплаты сессии Stripe, при которых платёж считается оплаченным
+PAID_STRIPE_STATUSES = ("paid", "no_payment_required")
+
+# События вебхука Stripe -> статус платежа (None — по payment_status сессии)
+CHECKOUT_EVENT_STATUSES = {
+    "checkout.session.completed": None,
+    "checkout.session.async_payment_succeeded": Payment.STATUS_PAID,
+    "checkout.session.async_payment_failed": Payment.STATUS_FAILED,
+    "checkout.session.expired": Payment.STATUS_FAILED,
+}
+
+
+def payment_status_cache_key(session_id: str) -> str:
+    return f"payments:status:{session_id}"
+
+
+def needs_stripe_refresh(payment: Payment) -> bool:
+    """
+    Статус обновляет вебхук Stripe; живой запрос нужен, только если платёж
+    давно ожидает оплаты и вебхук, возможно, потерялся.
+    """
+    stale_before = timezone.now() - timedelta(
+        seconds=settings.PAYMENT_STATUS_STALE_AFTER
+    )
+    return (
+        payment.status == Payment.STATUS_PENDING and payment.updated_at < stale_before
+    )
+
+
+def _status_for(stripe_status: str) -> str:
+    if stripe_status in PAID_STRIPE_STATUSES:
+        return Payment.STATUS_PAID
+    return Payment.STATUS_PENDING
+
+
+def apply_stripe_status(payment: Payment, stripe_status: str) -> None:
+    """
+    Сохраняет статус сессии Stripe, полученный живым запросом.
+    """
+    payment.set_status(_status_for(stripe_status), stripe_status=stripe_status)
+    if settings.CACHE_ENABLED:
+        cache.delete(payment_status_cache_key(payment.stripe_session_id))
+
+
+def apply_checkout_event(event) -> int:
+    """
+    Обновляет платёж по событию вебхука Stripe. Возвращает число обновлённых
+    платежей (0 — событие не относится к оплате или платёж не найден).
+    """
+    if event["type"] not in CHECKOUT_EVENT_STATUSES:
+        return 0
+
+    session = event["data"]["object"]
+    stripe_status = session.get("payment_status")
+    status = CHECKOUT_EVENT_STATUSES[event["type"]] or _status_for(stripe_status)
+
+    updated = Payment.objects.filter(stripe_session_id=session["id"]).update(
+        status=status, stripe_status=stripe_status, updated_at=timezone.now()
+    )
+    if settings.CACHE_ENABLED:
+        cache.delete(payment_status_cache_key(session["id"]))
+    return updated
@@ -1,5 +1,10 @@
+import asyncio
+import ssl
+import weakref
 from typing import Tuple
 
+import anyio
+import httpx
 import stripe
 
 from config import settings
@@ -7,14 +12,67 @@ from config import settings
 stripe.api_key = settings.STRIPE_API_KEY
 
 
+class PooledHTTPXClient(stripe.HTTPXClient):
+    """
+    Асинхронный HTTP-клиент Stripe с ограниченным пулом соединений:
+    keep-alive соединения переиспользуются, одновременно открыто не больше
+    STRIPE_MAX_CONNECTIONS, остальные запросы ждут свободное соединение.
+    """
+
+    def __init__(self, verify_ssl_certs=True, proxy=None):
+        # Конструктор HTTPXClient создаёт AsyncClient без настроек пула, и его
+        # пришлось бы подменять. Поэтому инициализируем базовый HTTPClient и
+        # задаём поля HTTPXClient сами; набор полей сверяется в тестах
+        stripe.HTTPClient.__init__(self, verify_ssl_certs=verify_ssl_certs, proxy=proxy)
+        self.httpx = httpx
+        self.anyio = anyio
+        self._timeout = httpx.Timeout(
+            settings.STRIPE_TIMEOUT, connect=settings.STRIPE_CONNECT_TIMEOUT
+        )
+        self._client = None
+        self._client_async = httpx.AsyncClient(
+            verify=(
+                ssl.create_default_context(cafile=stripe.ca_bundle_path)
+                if self._verify_ssl_certs
+                else False
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.STRIPE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.STRIPE_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+
+
+# Пул httpx привязан к циклу событий, поэтому клиент — один на цикл
+# (под uvicorn — один на процесс)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_stripe_client() -> stripe.StripeClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = stripe.StripeClient(
+            settings.STRIPE_API_KEY,
+            base_addresses={"api": stripe.api_base},
+            http_client=PooledHTTPXClient(
+                verify_ssl_certs=stripe.verify_ssl_certs, proxy=stripe.proxy
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
 def create_stripe_product(name: str) -> str:
     product = stripe.Product.create(name=name)
     return product.id
 
 
-def create_stripe_price(product_id: str, amount_in_kop: int) -> str:
+def create_stripe_price(
+    product_id: str, amount_in_kop: int, currency: str = "rub"
+) -> str:
     price = stripe.Price.create(
-        product=product_id, unit_amount=amount_in_kop, currency="rub"
+        product=product_id, unit_amount=amount_in_kop, currency=currency
     )
     return price.id
 
@@ -40,3 +98,61 @@ def create_checkout_session(
 def get_checkout_session_status(session_id: str) -> str:
     session = stripe.checkout.Session.retrieve(session_id)
     return session.payment_status
+
+
+async def acreate_stripe_product(name: str) -> str:
+    product = await get_async_stripe_client().v1.products.create_async(
+        params={"name": name}
+    )
+    return product.id
+
+
+async def acreate_stripe_price(
+    product_id: str, amount_in_kop: int, currency: str = "rub"
+) -> str:
+    price = await get_async_stripe_client().v1.prices.create_async(
+        params={
+            "product": product_id,
+            "unit_amount": amount_in_kop,
+            "currency": currency,
+        }
+    )
+    return price.id
+
+
+async def acreate_checkout_session(
+    price_id: str, success_url: str, cancel_url: str
+) -> Tuple[str, str]:
+    session = await get_async_stripe_client().v1.checkout.sessions.create_async(
+        params={
+            "payment_method_types": ["card"],
+            "line_items": [
+                {
+                    "price": price_id,
+                    "quantity": 1,
+                }
+            ],
+            "mode": "payment",
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+        }
+    )
+    return session.id, session.url
+
+
+async def aget_checkout_session_status(session_id: str) -> str:
+    session = await get_async_stripe_client().v1.checkout.sessions.retrieve_async(
+        session_id
+    )
+    return session.payment_status
+
+
+def webhook_enabled() -> bool:
+    # Подпись с пустым секретом подделает кто угодно — без секрета вебхук отключён
+    return bool(settings.STRIPE_WEBHOOK_SECRET)
+
+
+def construct_webhook_event(payload: bytes, sig_header: str) -> stripe.Event:
+    return stripe.Webhook.construct_event(
+        payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
+    )
@@ -0,0 +1,72 @@
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+
+def thumbnail_name(name, size_name):
+    """
+    Путь миниатюры рядом с оригиналом:
+    course_previews/a.jpg -> course_previews/thumbnails/a_small.webp
+    """
+    directory, filename = posixpath.split(posixpath.splitext(name)[0])
+    return posixpath.join(directory, "thumbnails", f"{filename}_{size_name}.webp")
+
+
+def thumbnail_urls(field_file, request=None):
+    """
+    URL миниатюр изображения по размерам из THUMBNAIL_SIZES (без обращения к
+    хранилищу). Миниатюры появляются после обработки загрузки в Celery.
+    """
+    if not field_file:
+        return None
+    urls = {}
+    for size_name in settings.THUMBNAIL_SIZES:
+        url = field_file.storage.url(thumbnail_name(field_file.name, size_name))
+        urls[size_name] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def has_new_upload(instance, field_name):
+    """
+    Загружен ли в поле новый файл, ещё не сохранённый в хранилище (pre_save).
+    """
+    field_file = getattr(instance, field_name)
+    return bool(field_file) and not field_file._committed
+
+
+def generate_thumbnails(field_file):
+    """
+    Создаёт WebP-миниатюры изображения для всех размеров из THUMBNAIL_SIZES.
+
+    Оригинал читается из хранилища потоком, а JPEG декодируется сразу в
+    уменьшенном масштабе (draft), поэтому полноразмерное изображение целиком
+    в памяти не держится. Меньшие размеры получаются из большего.
+    Возвращает пути созданных файлов.
+    """
+    storage = field_file.storage
+    sizes = sorted(
+        settings.THUMBNAIL_SIZES.items(), key=lambda item: item[1], reverse=True
+    )
+
+    created = []
+    with field_file.open("rb") as source, Image.open(source) as image:
+        image.thumbnail((sizes[0][1], sizes[0][1]))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        for size_name, size in sizes:
+            image.thumbnail((size, size))
+            buffer = BytesIO()
+            image.save(buffer, "WEBP", quality=settings.THUMBNAIL_QUALITY)
+
+            path = thumbnail_name(field_file.name, size_name)
+            # Повторная обработка перезаписывает миниатюру, а не создаёт копию
+            if storage.exists(path):
+                storage.delete(path)
+            created.append(storage.save(path, ContentFile(buffer.getvalue())))
+    return created
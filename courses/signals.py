@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_list_versions, invalidate_subscriptions
+from .models import Course, Lesson, Subscription
+from .services.thumbnail_service import has_new_upload
+from .tasks import schedule_thumbnails
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    # Удаление курса обнуляет course у его уроков — списки уроков тоже меняются
+    bump_list_versions("course", "lesson")
+
+
+@receiver(pre_delete, sender=Course)
+def touch_orphaned_lessons(sender, instance, **kwargs):
+    # SET_NULL обнулит course у уроков UPDATE-ом без updated_at — без новой
+    # версии их кэш и ETag продолжали бы отдавать удалённый курс
+    Lesson.objects.filter(course=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=get_user_model())
+def touch_owned_objects(sender, instance, **kwargs):
+    # То же для владельца: SET_NULL обнулит owner у его курсов и уроков
+    now = timezone.now()
+    courses = Course.objects.filter(owner=instance).update(updated_at=now)
+    lessons = Lesson.objects.filter(owner=instance).update(updated_at=now)
+    if courses or lessons:
+        bump_list_versions("course", "lesson")
+
+
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=Lesson)
+def remember_new_preview(sender, instance, **kwargs):
+    # После сохранения файл уже в хранилище — новую загрузку видно только здесь
+    instance._new_images = ["preview"] if has_new_upload(instance, "preview") else []
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def schedule_preview_thumbnails(sender, instance, **kwargs):
+    schedule_thumbnails(instance, getattr(instance, "_new_images", []))
+
+
+@receiver(post_save, sender=Lesson)
+def invalidate_lesson_cache(sender, instance, **kwargs):
+    # Курс содержит вложенные уроки, поэтому сбрасываются и списки курсов
+    bump_list_versions("course", "lesson")
+
+
+@receiver(post_delete, sender=Lesson)
+def invalidate_deleted_lesson_cache(sender, instance, **kwargs):
+    if instance.course_id is not None:
+        # Новая версия курса (updated_at) — новый ключ кэша курса
+        Course.objects.filter(pk=instance.course_id).update(
+            updated_at=timezone.now(), lessons_count=F("lessons_count") - 1
+        )
+    bump_list_versions("course", "lesson")
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscription_cache(sender, instance, **kwargs):
+    invalidate_subscriptions(instance.user_id)
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(sender, instance, created, **kwargs):
+    if created:
+        Course.objects.filter(pk=instance.course_id).update(
+            subscribers_count=F("subscribers_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    Course.objects.filter(pk=instance.course_id).update(
+        subscribers_count=F("subscribers_count") - 1
+    )
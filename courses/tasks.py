@@ -1,44 +1,181 @@
 import logging
-from datetime import timedelta
+import time
+from functools import partial
 
 from celery import shared_task
+from django.apps import apps
 from django.conf import settings
-from django.core.mail import send_mail
-from django.utils import timezone
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+
+from config.db_router import replica_reads
 
 from .models import Course, Subscription
+from .services.thumbnail_service import generate_thumbnails
 
 logger = logging.getLogger(__name__)
 
+COURSE_UPDATE_EMAIL_STATS_KEY = "courses:update_email:stats:{name}"
+
+
+def course_update_email_key(course_id):
+    return f"courses:update_email:scheduled:{course_id}"
+
+
+def _incr_course_update_email_stat(name):
+    key = COURSE_UPDATE_EMAIL_STATS_KEY.format(name=name)
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key)
+
+
+def get_course_update_email_stats():
+    """
+    Возвращает количество запланированных и схлопнутых рассылок.
+    """
+    return {
+        name: cache.get(COURSE_UPDATE_EMAIL_STATS_KEY.format(name=name), 0)
+        for name in ("scheduled", "coalesced")
+    }
+
+
+def schedule_course_update_email(course_id):
+    """
+    Планирует рассылку об обновлении курса через COURSE_UPDATE_EMAIL_DEBOUNCE
+    секунд. Повторные обновления курса в этом окне не ставят новых задач.
+
+    Возвращает True, если задача поставлена, и False, если обновление
+    схлопнуто с уже запланированной рассылкой.
+
+    Схлопывание требует общего кэша (Redis, CACHE_ENABLED): ключ ставит
+    веб-процесс, а снимает воркер Celery. С процессным кэшем воркер не смог бы
+    снять ключ, и правки после рассылки терялись бы — поэтому без общего кэша
+    рассылка ставится на каждое обновление сразу.
+    """
+    if not settings.CACHE_ENABLED:
+        send_course_update_email.delay(course_id)
+        return True
+
+    window = settings.COURSE_UPDATE_EMAIL_DEBOUNCE
+    # Ключ живёт дольше окна на случай задержки очереди; его снимает сама задача
+    if cache.add(course_update_email_key(course_id), 1, timeout=window * 2 + 60):
+        send_course_update_email.apply_async((course_id,), countdown=window)
+        _incr_course_update_email_stat("scheduled")
+        return True
+
+    coalesced = _incr_course_update_email_stat("coalesced")
+    logger.info(
+        f"Рассылка по курсу {course_id} уже запланирована, обновление схлопнуто "
+        f"(всего схлопнуто: {coalesced})."
+    )
+    return False
+
 
 @shared_task
 def send_course_update_email(course_id):
     """
     Асинхронная задача отправки email подписчикам об обновлении курса.
+
+    Подписчики читаются из БД потоково и раздаются подзадачам пачками
+    по COURSE_UPDATE_EMAIL_BATCH_SIZE адресов.
     """
-    course = Course.objects.get(id=course_id)
+    # Следующее обновление курса запланирует новую рассылку
+    cache.delete(course_update_email_key(course_id))
 
-    # Проверка: обновлялся ли курс менее 4 часов назад
-    if course.updated_at and course.updated_at > timezone.now() - timedelta(hours=4):
-        logger.info(
-            f"Курс {course_id} был обновлён менее 4х часов назад. Уведомления не будет."
-        )
-        print(
-            f"Курс {course_id} был обновлён менее 4х часов назад. Уведомления не будет."
-        )  # Только для отладки
-        return
-
-    subscribers = Subscription.objects.filter(
-        course=course, is_active=True
-    ).select_related("user")
-
-    for sub in subscribers:
-        user = sub.user
-        subject = f"[Обновление] Курс '{course.title}' обновлён!"
+    # Задача только читает: курс обновлён раньше окна схлопывания, поэтому
+    # отставание реплики не важно
+    with replica_reads():
+        return _send_course_update_email(course_id)
+
+
+def _send_course_update_email(course_id):
+    # Частоту рассылок ограничивает окно схлопывания в schedule_course_update_email
+    course = Course.objects.only("id", "title").get(id=course_id)
+
+    batch_size = settings.COURSE_UPDATE_EMAIL_BATCH_SIZE
+    recipients = (
+        Subscription.objects.filter(course_id=course_id, user__is_active=True)
+        .order_by("id")
+        .values_list("user__email", "user__first_name")
+        .iterator(chunk_size=batch_size)
+    )
+
+    batch = []
+    batches = 0
+    for email, first_name in recipients:
+        batch.append((email, first_name))
+        if len(batch) >= batch_size:
+            send_course_update_email_batch.delay(course.title, batch)
+            batches += 1
+            batch = []
+    if batch:
+        send_course_update_email_batch.delay(course.title, batch)
+        batches += 1
+
+    logger.info(f"Рассылка по курсу {course_id} разбита на {batches} пачек.")
+    return batches
+
+
+@shared_task
+def send_course_update_email_batch(course_title, recipients):
+    """
+    Отправляет пачку писем об обновлении курса через одно SMTP-соединение.
+    """
+    started = time.monotonic()
+    subject = f"[Обновление] Курс '{course_title}' обновлён!"
+
+    messages = []
+    for email, first_name in recipients:
         message = f"""
-        Привет, {user.first_name or user.email}!
+        Привет, {first_name or email}!
 
-        Курс "{course.title}" был обновлён. Заходи и посмотри, что нового!
+        Курс "{course_title}" был обновлён. Заходи и посмотри, что нового!
         """
-        recipient_list = [user.email]
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient_list)
+        messages.append(
+            EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
+        )
+
+    with get_connection() as connection:
+        sent = connection.send_messages(messages) or 0
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Отправлено {sent} из {len(messages)} писем за {elapsed:.2f} с "
+        f"({sent / elapsed if elapsed else sent:.1f} писем/с)."
+    )
+    return sent
+
+
+def schedule_thumbnails(instance, field_names):
+    """
+    Ставит создание миниатюр для загруженных изображений после коммита
+    транзакции, когда файл и запись уже сохранены.
+    """
+    for field_name in field_names:
+        transaction.on_commit(
+            partial(
+                generate_thumbnails_task.delay,
+                instance._meta.label,
+                instance.pk,
+                field_name,
+            )
+        )
+
+
+@shared_task
+def generate_thumbnails_task(model_label, pk, field_name):
+    """
+    Создаёт WebP-миниатюры изображения из поля field_name объекта модели.
+    """
+    started = time.monotonic()
+    model = apps.get_model(model_label)
+    instance = model.objects.only("pk", field_name).filter(pk=pk).first()
+    if instance is None or not getattr(instance, field_name):
+        return []
+
+    created = generate_thumbnails(getattr(instance, field_name))
+    logger.info(
+        f"Миниатюры {model_label} {pk} ({field_name}): {len(created)} файлов "
+        f"за {time.monotonic() - started:.2f} с."
+    )
+    return created
@@ -1,11 +1,58 @@
-from unittest.mock import patch
+import asyncio
+import hashlib
+import hmac
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest.mock import AsyncMock, patch
+from urllib.parse import parse_qs
 
+import httpx
+import stripe
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from courses.models import Course, Lesson, Subscription
+from config.db_router import (
+    ReplicaRouter,
+    ReplicaRoutingMiddleware,
+    primary_reads,
+    replica_pin_key,
+    replica_reads,
+)
+from config.metrics import QueryBudgetExceeded, registry
+from config.testing import QueryBudgetTestMixin
+from courses.cache import get_list_version, get_subscribed_course_ids
+from courses.models import Course, Lesson, StripePrice, Subscription
+from courses.services.payment_service import clear_price_cache
+from courses.services.stripe_service import PooledHTTPXClient
+from courses.services.thumbnail_service import thumbnail_name
+from courses.tasks import (
+    generate_thumbnails_task,
+    get_course_update_email_stats,
+    send_course_update_email,
+    send_course_update_email_batch,
+)
+from courses.views import CourseViewSet
 from users.models import Payment
 
 User = get_user_model()
@@ -162,6 +209,338 @@ class LessonTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+@override_settings(CACHE_ENABLED=True)
+class CourseCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.user
+        )
+        self.lesson = Lesson.objects.create(
+            title="Variables",
+            description="...",
+            video_url="https://youtube.com/watch?v=test",
+            course=self.course,
+            owner=self.user,
+        )
+
+    def _get(self, url):
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), len(context.captured_queries)
+
+    def test_course_detail_served_from_cache(self):
+        """Повторное чтение курса не выполняет сериализацию из БД"""
+        first, first_queries = self._get(f"/courses/{self.course.id}/")
+        second, second_queries = self._get(f"/courses/{self.course.id}/")
+        self.assertEqual(first, second)
+        self.assertEqual(second_queries, 1)  # Только проверка версии курса
+        self.assertLess(second_queries, first_queries)
+
+    def test_lesson_change_invalidates_course(self):
+        """Изменение урока сбрасывает кэш курса и списка курсов"""
+        self._get(f"/courses/{self.course.id}/")
+        self._get("/courses/")
+        self.lesson.title = "Functions"
+        self.lesson.save()
+
+        detail, _ = self._get(f"/courses/{self.course.id}/")
+        self.assertEqual(detail["lessons"][0]["title"], "Functions")
+        listing, _ = self._get("/courses/")
+        self.assertEqual(listing["results"][0]["lessons"][0]["title"], "Functions")
+
+        self.lesson.delete()
+        detail, _ = self._get(f"/courses/{self.course.id}/")
+        self.assertEqual(detail["lessons_count"], 0)
+
+    def test_deleted_course_refreshes_lessons(self):
+        """Удаление курса даёт урокам новую версию: кэш и ETag без удалённого курса"""
+        url = f"/lessons/{self.lesson.id}/"
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.data["course"], self.course.id)
+
+        self.course.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["course"])
+
+    def test_deleted_owner_refreshes_objects(self):
+        """Удаление владельца даёт его курсам и урокам новую версию"""
+        moderator = User.objects.create_user(
+            email="moderator@example.com", password="password123"
+        )
+        moderator.groups.add(Group.objects.get_or_create(name="Модераторы")[0])
+        self.client.force_authenticate(user=moderator)
+        urls = [f"/courses/{self.course.id}/", f"/lessons/{self.lesson.id}/"]
+        for url in urls:
+            self.assertEqual(self.client.get(url).data["owner"], self.user.id)
+        self.assertEqual(
+            self.client.get("/courses/").data["results"][0]["owner"], self.user.id
+        )
+
+        self.user.delete()
+        for url in urls:
+            self.assertIsNone(self.client.get(url).data["owner"])
+        self.assertIsNone(self.client.get("/courses/").data["results"][0]["owner"])
+
+    def test_subscription_is_merged_per_user(self):
+        """Подписка подставляется для пользователя поверх общего кэша"""
+        detail, _ = self._get(f"/courses/{self.course.id}/")
+        self.assertFalse(detail["is_subscribed"])
+
+        Subscription.objects.create(user=self.user, course=self.course)
+        detail, queries = self._get(f"/courses/{self.course.id}/")
+        self.assertTrue(detail["is_subscribed"])
+        self.assertEqual(detail["subscribers_count"], 1)
+        self.assertEqual(queries, 2)  # Версия курса и подписки пользователя
+
+    @override_settings(DATABASE_REPLICAS=["replica_0"])
+    def test_cache_is_filled_from_primary(self):
+        """Общий кэш заполняется из основной БД, а не с реплики"""
+        route = ReplicaRouter.db_for_read
+        routed = []
+
+        def db_for_read(router, model, **hints):
+            # Реплики в тестах нет: запоминаем выбор роутера без учёта
+            # транзакции теста, а читаем основную БД
+            with patch.object(connection, "in_atomic_block", False):
+                routed.append((model, route(router, model, **hints)))
+            return "default"
+
+        with patch.object(ReplicaRouter, "db_for_read", db_for_read):
+            self._get("/courses/")
+        self.assertIn((Course, "replica_0"), routed)  # Проверка версии списка
+        self.assertIn((Course, "default"), routed)
+        self.assertNotIn((Lesson, "replica_0"), routed)
+
+    def test_other_user_subscription_refreshes_counters(self):
+        """Подписка другого пользователя меняет ETag, но не сбрасывает общий кэш"""
+        self.client.force_authenticate(user=self.user)
+        detail_etag = self.client.get(f"/courses/{self.course.id}/")["ETag"]
+        list_etag = self.client.get("/courses/")["ETag"]
+        list_version = get_list_version("course")
+
+        other = User.objects.create_user(
+            email="other@example.com", password="password123"
+        )
+        Subscription.objects.create(user=other, course=self.course)
+
+        response = self.client.get(
+            f"/courses/{self.course.id}/", HTTP_IF_NONE_MATCH=detail_etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["subscribers_count"], 1)
+        self.assertNotIn("Last-Modified", response)
+
+        response = self.client.get("/courses/", HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["subscribers_count"], 1)
+        self.assertEqual(get_list_version("course"), list_version)
+
+
+class ConditionalGetTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.user
+        )
+        self.lesson = Lesson.objects.create(
+            title="Variables",
+            description="...",
+            video_url="https://youtube.com/watch?v=test",
+            course=self.course,
+            owner=self.user,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_course_detail_not_modified(self):
+        """Неизменённый курс возвращает 304 по ETag"""
+        response = self.client.get(f"/courses/{self.course.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        # Версия курса включает счётчики, поэтому курс отдаётся только с ETag
+        self.assertNotIn("Last-Modified", response)
+
+        response = self.client.get(
+            f"/courses/{self.course.id}/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.lesson.title = "Functions"
+        self.lesson.save()
+        response = self.client.get(
+            f"/courses/{self.course.id}/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_subscription_changes_course_etag(self):
+        """Подписка меняет ETag курса, так как меняет is_subscribed"""
+        etag = self.client.get(f"/courses/{self.course.id}/")["ETag"]
+        Subscription.objects.create(user=self.user, course=self.course)
+        response = self.client.get(
+            f"/courses/{self.course.id}/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["is_subscribed"])
+
+    def test_lesson_list_not_modified(self):
+        """Неизменённый список уроков возвращает 304, удаление урока — 200"""
+        etag = self.client.get("/lessons/")["ETag"]
+        response = self.client.get("/lessons/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.lesson.delete()
+        response = self.client.get("/lessons/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cursor_list_etag_without_count(self):
+        """ETag курсорной страницы считается по её строкам, без COUNT по таблице"""
+        moderator = User.objects.create_user(
+            email="moderator@example.com", password="password123"
+        )
+        moderator.groups.add(Group.objects.get_or_create(name="Модераторы")[0])
+        self.client.force_authenticate(user=moderator)
+        url = "/lessons/?pagination=cursor&page_size=1"
+
+        with CaptureQueriesContext(connection) as context:
+            etag = self.client.get(url)["ETag"]
+        sql = " ".join(query["sql"] for query in context.captured_queries)
+        self.assertNotIn("COUNT(", sql)
+        self.assertNotIn("MAX(", sql)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Новый урок меняет ссылку next первой страницы
+        Lesson.objects.create(
+            title="Functions", description="...", course=self.course, owner=self.user
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_list_without_last_modified(self):
+        """Список без Last-Modified: удаление не меняет максимальный updated_at"""
+        Lesson.objects.create(
+            title="Functions", description="...", course=self.course, owner=self.user
+        )
+        response = self.client.get("/lessons/")
+        self.assertIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+        self.lesson.delete()
+        response = self.client.get(
+            "/lessons/", HTTP_IF_MODIFIED_SINCE=http_date(time.time())
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+
+
+class LessonBulkCreateTestCase(QueryBudgetTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.courses = [
+            Course.objects.create(
+                title=f"Course {i}", description="...", owner=self.user
+            )
+            for i in range(2)
+        ]
+        Course.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+    def test_bulk_create_lessons(self):
+        """Массовое создание уроков: один INSERT и один UPDATE курсов"""
+        self.client.force_authenticate(user=self.user)
+        data = [
+            {
+                "title": f"Lesson {i}",
+                "description": "...",
+                "video_url": "https://youtube.com/watch?v=bulk",
+                "course": self.courses[i % 2].id,
+            }
+            for i in range(4)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post("/lessons/bulk/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()), 4)
+        self.assertEqual(Lesson.objects.filter(owner=self.user).count(), 4)
+
+        statements = [query["sql"].split()[0] for query in context.captured_queries]
+        self.assertEqual(statements.count("INSERT"), 1)
+        self.assertEqual(statements.count("UPDATE"), 1)
+        for course in self.courses:
+            course.refresh_from_db()
+            self.assertGreater(course.updated_at, timezone.now() - timedelta(hours=1))
+
+    def test_bulk_create_validates_each_lesson(self):
+        """Каждый урок в списке проходит валидацию ссылки"""
+        self.client.force_authenticate(user=self.user)
+        data = [
+            {
+                "title": "Bad Lesson",
+                "description": "...",
+                "video_url": "https://vimeo.com/test",
+                "course": self.courses[0].id,
+            }
+        ]
+        response = self.client.post("/lessons/bulk/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Lesson.objects.exists())
+
+    def test_bulk_create_query_count_does_not_grow(self):
+        """Курсы всех уроков проверяются одним запросом, а не по одному"""
+        self.client.force_authenticate(user=self.user)
+        data = [
+            {
+                "title": f"Lesson {i}",
+                "description": "...",
+                "video_url": "https://youtube.com/watch?v=bulk",
+                "course": self.courses[i % 2].id,
+                "owner": self.user.id,
+            }
+            for i in range(50)
+        ]
+        response = self.client.post("/lessons/bulk/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertQueryBudget(response)
+
+        data[1]["course"] = 999999
+        response = self.client.post("/lessons/bulk/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("course", response.json()[1])
+        self.assertEqual(Lesson.objects.count(), 50)
+
+    def test_bulk_update_accepts_updated_at(self):
+        """bulk_update не дублирует updated_at, если он уже в списке полей"""
+        lesson = Lesson.objects.create(title="Old", course=self.courses[0])
+        lesson.title = "New"
+        Lesson.objects.bulk_update([lesson], ["title", "updated_at"])
+        lesson.refresh_from_db()
+        self.assertEqual(lesson.title, "New")
+
+    def test_lesson_without_course_can_be_saved(self):
+        """Урок без курса сохраняется без ошибок"""
+        lesson = Lesson.objects.create(
+            title="Standalone",
+            description="...",
+            video_url="https://youtube.com/watch?v=test",
+        )
+        self.assertEqual(str(lesson), "Standalone")
+
+
 class SubscriptionTestCase(APITestCase):
 
     def setUp(self):
@@ -196,6 +575,231 @@ class SubscriptionTestCase(APITestCase):
             Subscription.objects.filter(user=self.user, course=self.course).exists()
         )
 
+    def test_toggle_is_single_query(self):
+        """Переключение подписки выполняется одним запросом, несуществующий курс — 404"""
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f"/courses/{self.course.id}/subscription/")
+        self.assertEqual(response.json()["message"], "Подписка добавлена")
+        self.assertEqual(len(ctx), 1)
+
+        response = self.client.post(f"/courses/{self.course.id + 100}/subscription/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    @override_settings(CACHE_ENABLED=True)
+    def test_bulk_subscribe_and_unsubscribe(self):
+        """Массовая подписка и отписка, кэш подписок сбрасывается"""
+        cache.clear()
+        other = Course.objects.create(title="Django", description="...")
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(get_subscribed_course_ids(self.user), set())
+
+        # Несуществующий курс пропускается, повторная подписка не дублируется
+        data = {
+            "action": "subscribe",
+            "course_ids": [self.course.id, other.id, other.id + 100],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/subscriptions/bulk/", data, format="json")
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual(response.json()["course_ids"], [self.course.id, other.id])
+        response = self.client.post("/subscriptions/bulk/", data, format="json")
+        self.assertEqual(response.json()["course_ids"], [])
+        self.assertEqual(
+            get_subscribed_course_ids(self.user), {self.course.id, other.id}
+        )
+
+        data = {"action": "unsubscribe", "course_ids": [other.id]}
+        response = self.client.post("/subscriptions/bulk/", data, format="json")
+        self.assertEqual(response.json()["course_ids"], [other.id])
+        self.assertEqual(get_subscribed_course_ids(self.user), {self.course.id})
+
+        data = {"action": "unsubscribe", "course_ids": []}
+        response = self.client.post("/subscriptions/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CourseCountersTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            password="password123",
+            phone="+79001234567",
+            city="Москва",
+        )
+        self.course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.user
+        )
+        self.other = Course.objects.create(title="Django", description="...")
+
+    def assertCounters(self, course, lessons, subscribers):
+        course.refresh_from_db()
+        self.assertEqual(
+            (course.lessons_count, course.subscribers_count), (lessons, subscribers)
+        )
+
+    def test_lessons_count(self):
+        """Счётчик уроков: создание, перенос, массовое создание и удаление"""
+        lesson = Lesson.objects.create(
+            title="L1",
+            description="...",
+            video_url="https://youtube.com/watch?v=test",
+            course=self.course,
+        )
+        self.assertCounters(self.course, 1, 0)
+
+        lesson = Lesson.objects.get(pk=lesson.pk)
+        lesson.course = self.other
+        lesson.save()
+        self.assertCounters(self.course, 0, 0)
+        self.assertCounters(self.other, 1, 0)
+
+        Lesson.objects.bulk_create(
+            [
+                Lesson(
+                    title="L2",
+                    description="...",
+                    video_url="https://youtube.com/watch?v=test",
+                    course=c,
+                )
+                for c in (self.course, self.course, self.other)
+            ]
+        )
+        self.assertCounters(self.course, 2, 0)
+        self.assertCounters(self.other, 2, 0)
+
+        lesson.delete()
+        self.assertCounters(self.other, 1, 0)
+
+    def test_deferred_course_id(self):
+        """Уроки без course_id не догружают его, сохранение не портит счётчик"""
+        for title in ("L1", "L2", "L3"):
+            Lesson.objects.create(title=title, description="...", course=self.course)
+
+        with self.assertNumQueries(1):
+            lessons = list(Lesson.objects.only("id", "title"))
+        self.assertEqual(len(lessons), 3)
+
+        lessons[0].title = "Renamed"
+        lessons[0].save()
+        self.assertCounters(self.course, 3, 0)
+
+        lesson = Lesson.objects.only("id", "title").get(pk=lessons[1].pk)
+        lesson.course = self.other
+        lesson.save()
+        self.assertCounters(self.course, 2, 0)
+        self.assertCounters(self.other, 1, 0)
+
+    def test_subscribers_count(self):
+        """Счётчик подписчиков: ORM, переключение и массовые операции"""
+        Subscription.objects.create(user=self.user, course=self.course)
+        self.assertCounters(self.course, 0, 1)
+        Subscription.objects.toggle(self.user.id, self.course.id)
+        self.assertCounters(self.course, 0, 0)
+        Subscription.objects.toggle(self.user.id, self.course.id)
+        self.assertCounters(self.course, 0, 1)
+
+        Subscription.objects.bulk_subscribe(
+            self.user.id, [self.course.id, self.other.id]
+        )
+        self.assertCounters(self.course, 0, 1)
+        self.assertCounters(self.other, 0, 1)
+        Subscription.objects.bulk_unsubscribe(self.user.id, [self.other.id])
+        self.assertCounters(self.other, 0, 0)
+
+        Subscription.objects.filter(course=self.course).delete()
+        self.assertCounters(self.course, 0, 0)
+
+    def test_course_save_keeps_counters(self):
+        """Сохранение загруженного ранее курса не перезаписывает счётчики"""
+        course = Course.objects.get(pk=self.course.pk)
+        Subscription.objects.create(user=self.user, course=self.course)
+        course.title = "Python Advanced"
+        course.save()
+        self.assertCounters(self.course, 0, 1)
+
+    def test_serializer_and_reconcile(self):
+        """Курс отдаёт счётчики, команда сверки исправляет расхождения"""
+        Lesson.objects.create(
+            title="L1",
+            description="...",
+            video_url="https://youtube.com/watch?v=test",
+            course=self.course,
+        )
+        Subscription.objects.create(user=self.user, course=self.course)
+        Course.objects.update(lessons_count=10, subscribers_count=10)
+
+        call_command("reconcile_course_counters", batch_size=1, stdout=StringIO())
+        self.assertCounters(self.course, 1, 1)
+        self.assertCounters(self.other, 0, 0)
+
+        self.client.force_authenticate(user=self.user)
+        data = self.client.get(f"/courses/{self.course.id}/").json()
+        self.assertEqual((data["lessons_count"], data["subscribers_count"]), (1, 1))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ThumbnailTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            password="password123",
+            phone="+79001234567",
+            city="Москва",
+        )
+
+    @staticmethod
+    def make_image(name, size):
+        buffer = BytesIO()
+        Image.new("RGB", size).save(buffer, "JPEG")
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    @patch("courses.tasks.generate_thumbnails_task.delay")
+    def test_preview_thumbnails(self, mock_delay):
+        """Миниатюры превью создаются после загрузки и отдаются в API"""
+        mock_delay.side_effect = generate_thumbnails_task
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(
+                title="Python Basics",
+                description="...",
+                owner=self.user,
+                preview=self.make_image("cover.jpg", (1600, 900)),
+            )
+        mock_delay.assert_called_once_with("courses.Course", course.pk, "preview")
+
+        for size_name, size in (("small", 160), ("medium", 480)):
+            path = thumbnail_name(course.preview.name, size_name)
+            with default_storage.open(path) as thumbnail, Image.open(
+                thumbnail
+            ) as image:
+                self.assertEqual(image.format, "WEBP")
+                self.assertEqual(max(image.size), size)
+
+        self.client.force_authenticate(user=self.user)
+        data = self.client.get(f"/courses/{course.id}/").json()
+        self.assertTrue(
+            data["preview_thumbnails"]["small"].endswith("_small.webp"),
+        )
+
+        # Сохранение без новой загрузки не пересоздаёт миниатюры
+        mock_delay.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            course.title = "Python Advanced"
+            course.save()
+        mock_delay.assert_not_called()
+
+        lesson = Lesson.objects.create(
+            title="Variables",
+            description="...",
+            video_url="https://youtube.com/watch?v=test",
+            course=course,
+        )
+        data = self.client.get(f"/lessons/{lesson.id}/").json()
+        self.assertIsNone(data["preview_thumbnails"])
+
 
 class PaginatorTestCase(APITestCase):
 
@@ -226,6 +830,22 @@ class PaginatorTestCase(APITestCase):
         self.assertEqual(len(response.json()["results"]), 10)  # 10 уроков на странице
         self.assertIn("next", response.json())  # Следующая страница должна быть
 
+    def test_lesson_cursor_pagination(self):
+        """Тестирование курсорной пагинации уроков"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/lessons/?pagination=cursor&page_size=5")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first_page = response.json()
+        self.assertNotIn("count", first_page)  # COUNT(*) не выполняется
+        self.assertEqual(len(first_page["results"]), 5)
+
+        response = self.client.get(first_page["next"])
+        second_page = response.json()
+        self.assertEqual(len(second_page["results"]), 5)
+        first_ids = {lesson["id"] for lesson in first_page["results"]}
+        second_ids = {lesson["id"] for lesson in second_page["results"]}
+        self.assertFalse(first_ids & second_ids)
+
     def test_course_pagination(self):
         """Тестирование пагинации курсов"""
         for i in range(6):
@@ -239,6 +859,322 @@ class PaginatorTestCase(APITestCase):
         self.assertIn("next", response.json())  # Следующая страница должна быть
 
 
+class CourseUpdateEmailTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email="owner@example.com", password="password123"
+        )
+        self.course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.owner
+        )
+        for i in range(5):
+            user = User.objects.create_user(
+                email=f"student{i}@example.com", password="password123"
+            )
+            Subscription.objects.create(user=user, course=self.course)
+
+    @override_settings(COURSE_UPDATE_EMAIL_BATCH_SIZE=2)
+    @patch("courses.tasks.send_course_update_email_batch.delay")
+    def test_subscribers_split_into_batches(self, mock_delay):
+        """Подписчики раздаются подзадачам пачками"""
+        mock_delay.side_effect = send_course_update_email_batch
+
+        batches = send_course_update_email(self.course.id)
+
+        self.assertEqual(batches, 3)
+        self.assertEqual(
+            [len(call.args[1]) for call in mock_delay.call_args_list], [2, 2, 1]
+        )
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f"student{i}@example.com" for i in range(5)],
+        )
+
+
+class CourseUpdateDebounceTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.user
+        )
+
+    @override_settings(CACHE_ENABLED=True, COURSE_UPDATE_EMAIL_DEBOUNCE=30)
+    @patch("courses.tasks.send_course_update_email.apply_async")
+    def test_burst_of_updates_schedules_one_notification(self, mock_apply_async):
+        """Серия правок курса порождает одну отложенную рассылку"""
+        self.client.force_authenticate(user=self.user)
+        for i in range(3):
+            response = self.client.patch(
+                f"/courses/{self.course.id}/", data={"title": f"Title {i}"}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        mock_apply_async.assert_called_once_with((self.course.id,), countdown=30)
+        self.assertEqual(
+            get_course_update_email_stats(), {"scheduled": 1, "coalesced": 2}
+        )
+
+    @override_settings(CACHE_ENABLED=True)
+    @patch("courses.tasks.send_course_update_email_batch.delay")
+    def test_debounced_run_notifies_about_fresh_update(self, mock_delay):
+        """Отложенная рассылка уходит, хотя курс обновлён только что"""
+        Subscription.objects.create(user=self.user, course=self.course)
+        self.client.force_authenticate(user=self.user)
+        with patch("courses.tasks.send_course_update_email.apply_async"):
+            self.client.patch(f"/courses/{self.course.id}/", data={"title": "New"})
+
+        self.assertEqual(send_course_update_email(self.course.id), 1)
+        mock_delay.assert_called_once()
+        # Следующее обновление снова планирует рассылку
+        with patch("courses.tasks.send_course_update_email.apply_async") as mock_apply:
+            self.client.patch(f"/courses/{self.course.id}/", data={"title": "Newer"})
+        mock_apply.assert_called_once()
+
+    @patch("courses.tasks.send_course_update_email.delay")
+    def test_without_shared_cache_every_update_notifies(self, mock_delay):
+        """Без общего кэша обновления не схлопываются и не теряются"""
+        self.client.force_authenticate(user=self.user)
+        for i in range(2):
+            self.client.patch(f"/courses/{self.course.id}/", data={"title": f"T{i}"})
+        self.assertEqual(mock_delay.call_count, 2)
+
+
+class CourseQueryCountTestCase(QueryBudgetTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            password="password123",
+            phone="+79001234567",
+            city="Москва",
+        )
+        for i in range(10):
+            course = Course.objects.create(
+                title=f"Course {i}", description="...", owner=self.user
+            )
+            for j in range(3):
+                Lesson.objects.create(
+                    title=f"Lesson {i}.{j}",
+                    description="...",
+                    video_url="https://youtube.com/watch?v=test",
+                    course=course,
+                    owner=self.user,
+                )
+            if i % 2:
+                Subscription.objects.create(user=self.user, course=course)
+
+    def _count_queries(self, url):
+        # Каждый запрос получает свежий объект пользователя, как при JWT
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertQueryBudget(response)
+        return len(context.captured_queries), response.json()["results"]
+
+    def test_course_list_query_count_does_not_depend_on_page_size(self):
+        """Количество запросов к списку курсов не зависит от размера страницы"""
+        small_count, small_results = self._count_queries("/courses/?page_size=2")
+        large_count, large_results = self._count_queries("/courses/?page_size=10")
+        self.assertEqual(len(large_results), 10)
+        self.assertEqual(small_count, large_count)
+
+    def test_course_list_uses_precomputed_values(self):
+        """Количество уроков и подписка берутся без запросов на каждый курс"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/courses/?page_size=10")
+        results = response.json()["results"]
+        for course in results:
+            self.assertEqual(course["lessons_count"], 3)
+            self.assertEqual(len(course["lessons"]), 3)
+            expected = Subscription.objects.filter(
+                user=self.user, course_id=course["id"]
+            ).exists()
+            self.assertEqual(course["is_subscribed"], expected)
+
+
+class RequestMetricsTestCase(QueryBudgetTestMixin, APITestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            password="password123",
+            phone="+79001234567",
+            city="Москва",
+        )
+        self.course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+        self.access = str(RefreshToken.for_user(self.user).access_token)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Количество запросов и время отдаются в заголовке Server-Timing"""
+        response = self.client.get("/courses/")
+        metrics = response.request_metrics
+        self.assertEqual(metrics.view_name, "courses:course-list")
+        self.assertEqual(metrics.query_budget, 7)
+        self.assertQueryBudget(response)
+        self.assertIn(f'desc="{metrics.queries} queries"', response["Server-Timing"])
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    def test_query_budget_exceeded(self):
+        """Превышение бюджета: ошибка в строгом режиме, иначе предупреждение в журнале"""
+        with patch.object(CourseViewSet, "query_budget", {"get": 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/courses/")
+            with override_settings(QUERY_BUDGET_STRICT=False):
+                with self.assertLogs("config.metrics", "WARNING"):
+                    response = self.client.get("/courses/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Server-Timing", response)
+
+    async def test_sync_view_metrics_under_asgi(self):
+        """Под ASGI учитываются запросы синхронного DRF-представления из его потока"""
+        response = await self.async_client.get(
+            "/courses/", headers={"Authorization": f"Bearer {self.access}"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.request_metrics.queries, 0)
+        self.assertQueryBudget(response)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_prometheus_endpoint(self):
+        """Накопленные метрики в формате Prometheus, доступ только по токену"""
+        self.client.get("/courses/")
+        self.client.logout()
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+
+        response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{view="courses:course-list",method="GET"} 1',
+            body,
+        )
+        self.assertIn(
+            'http_request_db_queries_total{view="courses:course-list",method="GET"}',
+            body,
+        )
+
+        with override_settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get("/metrics/").status_code, 404)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0"], REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTestCase(SimpleTestCase):
+    """Маршрутизация проверяется без реплики: роутер только выбирает алиас"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        cache.clear()
+
+    def route(self, request, user):
+        """Прогоняет запрос через middleware и возвращает БД для чтения в нём"""
+        databases = []
+
+        def view(request):
+            # Как DRF: пользователь записывается в запрос после аутентификации
+            request.user = user
+            databases.append(self.router.db_for_read(Course))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return databases[0]
+
+    def test_reads_outside_requests_use_primary(self):
+        """Вне запроса читается основная БД, в replica_reads — реплика"""
+        self.assertEqual(self.router.db_for_read(Course), "default")
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Course), "replica_0")
+            self.assertEqual(self.router.db_for_write(Course), "default")
+
+    def test_safe_methods_read_from_replica(self):
+        """GET читает с реплики, POST — из основной БД"""
+        user = User(pk=1, email="reader@example.com")
+        self.assertEqual(self.route(self.factory.get("/courses/"), user), "replica_0")
+        self.assertEqual(self.route(self.factory.post("/courses/"), user), "default")
+
+    def test_read_your_writes(self):
+        """После изменяющего запроса пользователь читает из основной БД"""
+        writer = User(pk=1, email="writer@example.com")
+        other = User(pk=2, email="other@example.com")
+        self.route(self.factory.post("/courses/"), writer)
+
+        self.assertEqual(self.route(self.factory.get("/courses/"), writer), "default")
+        self.assertEqual(self.route(self.factory.get("/courses/"), other), "replica_0")
+
+        cache.clear()  # Окно закрепления истекло
+        self.assertEqual(self.route(self.factory.get("/courses/"), writer), "replica_0")
+
+    def test_primary_reads_inside_safe_request(self):
+        """primary_reads() читает основную БД даже внутри GET-запроса"""
+        databases = []
+
+        def view(request):
+            request.user = User(pk=1, email="reader@example.com")
+            databases.append(self.router.db_for_read(Course))
+            with primary_reads():
+                databases.append(self.router.db_for_read(Course))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(self.factory.get("/courses/"))
+        self.assertEqual(databases, ["replica_0", "default"])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик всё идёт в основную БД, закрепление не пишется"""
+        user = User(pk=1, email="user@example.com")
+        self.assertEqual(self.route(self.factory.get("/courses/"), user), "default")
+        self.route(self.factory.post("/courses/"), user)
+        self.assertIsNone(cache.get(replica_pin_key(1)))
+
+
+class LoadTestToolsTestCase(TestCase):
+
+    def test_generate_data_and_benchmark(self):
+        """Синтетические данные создаются пачками, бенчмарк откатывает изменения"""
+        call_command(
+            "generate_data",
+            users=60,
+            courses=10,
+            lessons=3,
+            subscriptions=2,
+            payments=200,
+            batch_size=25,
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Payment.objects.count(), 200)
+        # Счётчики курсов совпадают с фактическими данными
+        for course in Course.objects.all():
+            self.assertEqual(course.lessons_count, course.lessons.count())
+            self.assertEqual(course.subscribers_count, course.subscription_set.count())
+
+        out = StringIO()
+        call_command(
+            "benchmark_api",
+            requests=2,
+            warmup=0,
+            endpoints=["course-list", "subscription-toggle", "register", "login"],
+            stdout=out,
+        )
+        report = out.getvalue()
+        for endpoint in ("course-list", "subscription-toggle", "register", "login"):
+            self.assertRegex(report, rf"{endpoint}\s+2\s")
+        self.assertNotIn("401", report)
+        self.assertEqual(User.objects.count(), 60)
+
+
 class PaymentCreateTestCase(APITestCase):
 
     def setUp(self):
@@ -252,9 +1188,9 @@ class PaymentCreateTestCase(APITestCase):
             title="Python Basics", description="...", owner=self.user
         )
 
-    @patch("courses.views.create_stripe_product")
-    @patch("courses.views.create_stripe_price")
-    @patch("courses.views.create_checkout_session")
+    @patch("courses.services.payment_service.create_stripe_product")
+    @patch("courses.services.payment_service.create_stripe_price")
+    @patch("courses.services.payment_service.create_checkout_session")
     def test_create_payment_and_get_stripe_session_url(
         self, mock_session, mock_price, mock_product
     ):
@@ -279,6 +1215,22 @@ class PaymentCreateTestCase(APITestCase):
             Payment.objects.filter(user=self.user, paid_course=self.course).exists()
         )
 
+    @patch("courses.services.payment_service.create_checkout_session")
+    def test_payment_requires_exactly_one_item(self, mock_session):
+        """Платёж без товара или сразу за курс и урок не создаётся"""
+        lesson = Lesson.objects.create(
+            title="Урок", course=self.course, owner=self.user
+        )
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        for items in ({}, {"paid_course": self.course.id, "paid_lesson": lesson.id}):
+            data = {"amount": "1000.00", "payment_method": "transfer", **items}
+            for url in ("/payments/create/", "/payments/create/async/"):
+                response = self.client.post(url, data=data, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Payment.objects.exists())
+        mock_session.assert_not_called()
+
     @patch("courses.views.get_checkout_session_status")
     def test_get_payment_status(self, mock_status):
         """Тестирование получения статуса платежа"""
@@ -300,3 +1252,319 @@ class PaymentCreateTestCase(APITestCase):
         response = self.client.get("/payments/status/cs_test123/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["status"], "paid")
+
+
+@patch("config.settings.STRIPE_WEBHOOK_SECRET", "whsec_test")
+class PaymentStatusTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.user
+        )
+        self.payment = Payment.objects.create(
+            user=self.user,
+            paid_course=self.course,
+            amount="100.00",
+            payment_method="transfer",
+            stripe_session_id="cs_test123",
+            stripe_status="unpaid",
+            status=Payment.STATUS_PENDING,
+        )
+
+    def _post_event(self, event, secret="whsec_test"):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+        return self.client.post(
+            "/payments/webhook/",
+            data=payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+        )
+
+    def test_webhook_marks_payment_paid(self):
+        """Вебхук checkout.session.completed отмечает платёж оплаченным"""
+        event = {
+            "id": "evt_test",
+            "object": "event",
+            "type": "checkout.session.completed",
+            "data": {"object": {"id": "cs_test123", "payment_status": "paid"}},
+        }
+        response = self._post_event(event)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PAID)
+        self.assertEqual(self.payment.stripe_status, "paid")
+
+    def test_webhook_rejects_invalid_signature(self):
+        """Вебхук с неверной подписью отклоняется"""
+        event = {"id": "evt_test", "object": "event", "type": "ping", "data": {}}
+        response = self._post_event(event, secret="whsec_wrong")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_webhook_disabled_without_secret(self):
+        """Без STRIPE_WEBHOOK_SECRET вебхук отключён, даже с подписью пустым ключом"""
+        event = {
+            "id": "evt_test",
+            "object": "event",
+            "type": "checkout.session.completed",
+            "data": {"object": {"id": "cs_test123", "payment_status": "paid"}},
+        }
+        # Патч класса применяется после патчей метода, поэтому — контекстом
+        with patch("config.settings.STRIPE_WEBHOOK_SECRET", ""):
+            response = self._post_event(event, secret="")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PENDING)
+
+    @patch("courses.views.get_checkout_session_status")
+    def test_fresh_status_is_read_from_database(self, mock_status):
+        """Свежий статус отдаётся из БД без запроса в Stripe"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/payments/status/cs_test123/")
+        self.assertEqual(response.json()["status"], "unpaid")
+        mock_status.assert_not_called()
+
+    @patch("courses.views.get_checkout_session_status")
+    def test_stale_pending_status_is_refreshed_from_stripe(self, mock_status):
+        """Давно ожидающий платёж проверяется в Stripe"""
+        mock_status.return_value = "paid"
+        Payment.objects.filter(pk=self.payment.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/payments/status/cs_test123/")
+        self.assertEqual(response.json()["status"], "paid")
+        mock_status.assert_called_once_with("cs_test123")
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PAID)
+
+    @patch("courses.views.aget_checkout_session_status", new_callable=AsyncMock)
+    def test_async_status_is_refreshed_from_stripe(self, mock_status):
+        """Async-представление статуса проверяет давний платёж в Stripe"""
+        mock_status.return_value = "paid"
+        Payment.objects.filter(pk=self.payment.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        response = self.client.get("/payments/status/cs_test123/async/")
+        self.assertEqual(response.json(), {"status": "paid"})
+        mock_status.assert_awaited_once_with("cs_test123")
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PAID)
+        self.assertGreater(response.request_metrics.queries, 0)
+
+        response = self.client.get("/payments/status/cs_unknown/async/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PooledHTTPXClientTestCase(SimpleTestCase):
+
+    @patch("httpx.AsyncClient")
+    def test_single_pooled_client(self, mock_async_client):
+        """Создаётся один AsyncClient с пулом и проверкой сертификатов из настроек"""
+        PooledHTTPXClient(verify_ssl_certs=False)
+        mock_async_client.assert_called_once()
+        kwargs = mock_async_client.call_args.kwargs
+        self.assertIs(kwargs["verify"], False)
+        self.assertEqual(
+            kwargs["limits"].max_connections, settings.STRIPE_MAX_CONNECTIONS
+        )
+
+    def test_matches_sdk_client_fields(self):
+        """Клиент задаёт те же поля, что конструктор HTTPXClient текущей версии SDK"""
+        sdk_client = stripe.HTTPXClient()
+        client = PooledHTTPXClient()
+        try:
+            self.assertEqual(vars(client).keys(), vars(sdk_client).keys())
+            self.assertIsInstance(client._client_async, httpx.AsyncClient)
+        finally:
+            asyncio.run(sdk_client.close_async())
+            asyncio.run(client.close_async())
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """
+    Минимальная имитация Stripe API для тестов без сети.
+    """
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        params = parse_qs(self.rfile.read(length).decode())
+        self.server.requests.append((self.path, params))
+
+        if self.server.fail_path and self.path.startswith(self.server.fail_path):
+            return self._send(
+                400,
+                {"error": {"type": "invalid_request_error", "message": "Fake error"}},
+            )
+
+        number = len(self.server.requests)
+        if self.path == "/v1/products":
+            return self._send(200, {"id": f"prod_{number}", "object": "product"})
+        if self.path == "/v1/prices":
+            return self._send(200, {"id": f"price_{number}", "object": "price"})
+        if self.path == "/v1/checkout/sessions":
+            return self._send(
+                200,
+                {
+                    "id": f"cs_{number}",
+                    "object": "checkout.session",
+                    "url": f"https://checkout.stripe.test/cs_{number}",
+                    "payment_status": "unpaid",
+                },
+            )
+        return self._send(404, {"error": {"message": "Unknown path"}})
+
+    def _send(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PaymentPipelineTestCase(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+        cls.server.requests = []
+        cls.server.fail_path = None
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.original_api_base = stripe.api_base
+        stripe.api_base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        stripe.api_base = cls.original_api_base
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        clear_price_cache()
+        self.server.requests.clear()
+        self.server.fail_path = None
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _create_payment(self):
+        data = {
+            "paid_course": self.course.id,
+            "amount": "1000.00",
+            "payment_method": "transfer",
+        }
+        return self.client.post("/payments/create/", data=data)
+
+    def test_successful_checkout_marks_payment_pending(self):
+        """Успешное создание сессии переводит платёж в статус pending"""
+        response = self._create_payment()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        payment = Payment.objects.get(user=self.user)
+        self.assertEqual(payment.status, Payment.STATUS_PENDING)
+        self.assertEqual(payment.stripe_session_url, response.json()["session_url"])
+        self.assertEqual(
+            [path for path, params in self.server.requests],
+            ["/v1/products", "/v1/prices", "/v1/checkout/sessions"],
+        )
+        self.assertEqual(self.server.requests[1][1]["unit_amount"], ["100000"])
+
+    def test_stripe_error_marks_payment_failed(self):
+        """Ошибка Stripe сохраняет платёж в статусе failed"""
+        self.server.fail_path = "/v1/prices"
+        response = self._create_payment()
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+
+        payment = Payment.objects.get(user=self.user)
+        self.assertEqual(payment.status, Payment.STATUS_FAILED)
+        self.assertIsNone(payment.stripe_session_id)
+
+    def test_repeat_purchase_reuses_stripe_price(self):
+        """Повторная оплата курса на ту же сумму создаёт только сессию"""
+        self._create_payment()
+        self.server.requests.clear()
+
+        response = self._create_payment()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [path for path, params in self.server.requests], ["/v1/checkout/sessions"]
+        )
+
+        # После сброса процессного кэша цена берётся из БД
+        clear_price_cache()
+        self.server.requests.clear()
+        self._create_payment()
+        self.assertEqual(
+            [path for path, params in self.server.requests], ["/v1/checkout/sessions"]
+        )
+        self.assertEqual(StripePrice.objects.filter(course=self.course).count(), 1)
+
+    def test_async_checkout(self):
+        """Async-оплата создаёт сессию через асинхронный клиент Stripe"""
+        access = RefreshToken.for_user(self.user).access_token
+        data = {
+            "paid_course": self.course.id,
+            "amount": "1000.00",
+            "payment_method": "transfer",
+        }
+        response = self.client_class().post(
+            "/payments/create/async/",
+            data=data,
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {access}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = Payment.objects.get(user=self.user)
+        self.assertEqual(payment.status, Payment.STATUS_PENDING)
+        self.assertEqual(payment.stripe_session_url, response.json()["session_url"])
+        self.assertEqual(
+            [path for path, params in self.server.requests],
+            ["/v1/products", "/v1/prices", "/v1/checkout/sessions"],
+        )
+        self.assertEqual(self.server.requests[1][1]["unit_amount"], ["100000"])
+        # Цена, созданная async-путём, переиспользуется синхронным
+        self.server.requests.clear()
+        clear_price_cache()
+        self._create_payment()
+        self.assertEqual(
+            [path for path, params in self.server.requests], ["/v1/checkout/sessions"]
+        )
+
+    def test_async_checkout_errors(self):
+        """Async-оплата: без токена — 401, ошибка Stripe — 502 и статус failed"""
+        data = {"paid_course": self.course.id, "amount": "1000.00"}
+        client = self.client_class()
+        response = client.post("/payments/create/async/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.server.fail_path = "/v1/checkout/sessions"
+        access = RefreshToken.for_user(self.user).access_token
+        response = client.post(
+            "/payments/create/async/",
+            data={**data, "payment_method": "transfer"},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {access}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(
+            Payment.objects.get(user=self.user).status, Payment.STATUS_FAILED
+        )
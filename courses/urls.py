@@ -4,6 +4,7 @@ from rest_framework.routers import DefaultRouter
 from courses.apps import CoursesConfig
 from courses.views import (
     CourseViewSet,
+    LessonBulkCreateAPIView,
     LessonCreateAPIView,
     LessonDestroyAPIView,
     LessonListAPIView,
@@ -11,6 +12,8 @@ from courses.views import (
     LessonUpdateAPIView,
     PaymentListView,
     PaymentStatusView,
+    StripeWebhookView,
+    SubscriptionBulkView,
     SubscriptionToggleView,
 )
 
@@ -23,6 +26,7 @@ urlpatterns = [
     path("", include(router.urls)),
     path("lessons/", LessonListAPIView.as_view(), name="lesson-list"),
     path("lessons/create/", LessonCreateAPIView.as_view(), name="lesson-create"),
+    path("lessons/bulk/", LessonBulkCreateAPIView.as_view(), name="lesson-bulk-create"),
     path("lessons/<int:pk>/", LessonRetrieveAPIView.as_view(), name="lesson-retrieve"),
     path(
         "lessons/update/<int:pk>/", LessonUpdateAPIView.as_view(), name="lesson-update"
@@ -31,11 +35,17 @@ urlpatterns = [
         "lessons/delete/<int:pk>/", LessonDestroyAPIView.as_view(), name="lesson-delete"
     ),
     path("payments/", PaymentListView.as_view(), name="payment-list"),
+    path("payments/webhook/", StripeWebhookView.as_view(), name="stripe-webhook"),
     path(
         "courses/<int:course_id>/subscription/",
         SubscriptionToggleView.as_view(),
         name="subscription",
     ),
+    path(
+        "subscriptions/bulk/",
+        SubscriptionBulkView.as_view(),
+        name="subscription-bulk",
+    ),
     path(
         "payments/status/<str:session_id>/",
         PaymentStatusView.as_view(),
@@ -1,44 +1,140 @@
-from django.db import transaction
+import json
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import Http404, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema
 from rest_framework import generics, status, viewsets
 from rest_framework.filters import OrderingFilter
-from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from users.authentication import aauthenticate
 from users.models import Payment
 from users.serializers import PaymentCreateSerializer
 
+from .cache import (
+    CachedReadMixin,
+    ConditionalGetMixin,
+    get_subscribed_course_ids,
+)
 from .models import Course, Lesson, Subscription
-from .paginators import CoursePagination, LessonPagination
+from .paginators import (
+    CourseCursorPagination,
+    CoursePagination,
+    CursorModePaginationMixin,
+    LessonCursorPagination,
+    LessonPagination,
+    PaymentCursorPagination,
+    PaymentPagination,
+)
 from .permissions import IsModeratorOrReadOnly, IsOwner
-from .serializers import CourseSerializer, LessonSerializer, PaymentSerializer
+from .serializers import (
+    CourseSerializer,
+    LessonSerializer,
+    PaymentSerializer,
+    SubscriptionBulkSerializer,
+)
+from .services.payment_service import (
+    apply_checkout_event,
+    apply_stripe_status,
+    astart_checkout,
+    needs_stripe_refresh,
+    payment_status_cache_key,
+    release_db_connections,
+    start_checkout,
+)
 from .services.stripe_service import (
-    create_checkout_session,
-    create_stripe_price,
-    create_stripe_product,
+    aget_checkout_session_status,
+    construct_webhook_event,
     get_checkout_session_status,
+    webhook_enabled,
 )
-from .tasks import send_course_update_email
+from .tasks import schedule_course_update_email
 
 
 @extend_schema(
     description="API для управления курсами: создание, просмотр, обновление, удаление.",
     tags=["Courses"],
 )
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(
+    ConditionalGetMixin,
+    CachedReadMixin,
+    CursorModePaginationMixin,
+    viewsets.ModelViewSet,
+):
     serializer_class = CourseSerializer
     pagination_class = CoursePagination  # Добавляем пагинацию
-
-    def get_queryset(self):
+    cursor_pagination_class = CourseCursorPagination  # ?pagination=cursor
+    cache_name = "course"
+    # subscribers_count меняется при каждой подписке — он подставляется
+    # в ответ отдельно, чтобы подписки не сбрасывали общий кэш курсов
+    personal_fields = ("is_subscribed", "subscribers_count")
+    # Счётчики меняются через F() без обновления updated_at
+    version_fields = ("updated_at", *Course.COUNTER_FIELDS)
+    # Бюджет SQL-запросов по методам (с учётом аутентификации), проверяется
+    # RequestMetricsMiddleware; удаление каскадное и не ограничивается
+    query_budget = {"get": 7, "post": 4, "put": 7, "patch": 7}
+
+    def get_scope_queryset(self):
         user = self.request.user
 
         if user.is_moderator:
             return Course.objects.all()
         return Course.objects.filter(owner=user)
 
+    def get_queryset(self):
+        user = self.request.user
+
+        # Подписка и вложенные уроки считаются одним набором запросов на всю
+        # страницу; количество уроков и подписчиков хранится в самом курсе
+        return (
+            self.get_scope_queryset()
+            .annotate(
+                is_subscribed=Exists(
+                    Subscription.objects.filter(user=user, course=OuterRef("pk"))
+                ),
+            )
+            .prefetch_related(
+                Prefetch(
+                    "lessons",
+                    queryset=Lesson.objects.only(
+                        "id", "title", "description", "video_url", "course_id"
+                    ),
+                )
+            )
+        )
+
+    def get_etag_extra(self):
+        # Ответ зависит от подписок пользователя
+        return sorted(get_subscribed_course_ids(self.request.user))
+
+    def personalize(self, items):
+        # Подписка зависит от пользователя и не хранится в общем кэше
+        subscribed = get_subscribed_course_ids(self.request.user)
+        if self.action == "retrieve":
+            # Счётчик уже прочитан вместе с версией курса
+            version = dict(zip(self.version_fields, self.get_object_version()))
+            counts = {item["id"]: version["subscribers_count"] for item in items}
+        else:
+            counts = dict(
+                Course.objects.filter(
+                    pk__in=[item["id"] for item in items]
+                ).values_list("id", "subscribers_count")
+            )
+        for item in items:
+            item["is_subscribed"] = item["id"] in subscribed
+            item["subscribers_count"] = counts.get(item["id"], 0)
+        return items
+
     def get_permissions(self):
         if self.action in ["create"]:
             permission_classes = [IsAuthenticated]
@@ -55,38 +151,77 @@ class CourseViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         course = serializer.save()
-        # Отправляем асинхронное уведомление
-        send_course_update_email.delay(course.id)
+        # Планируем асинхронное уведомление (серия правок — одна рассылка)
+        schedule_course_update_email(course.id)
 
 
 @extend_schema(description="API для создания урока.", tags=["Lessons"])
 class LessonCreateAPIView(generics.CreateAPIView):
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 4
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+@extend_schema(
+    description="API для массового создания уроков (список уроков в теле запроса).",
+    tags=["Lessons"],
+)
+class LessonBulkCreateAPIView(generics.CreateAPIView):
+    serializer_class = LessonSerializer
+    permission_classes = [IsAuthenticated]
+    max_lessons = 100  # Максимальное количество уроков в одном запросе
+    # Курсы и владельцы всех уроков проверяются одним запросом на поле
+    query_budget = 6
+
+    def get_serializer(self, *args, **kwargs):
+        if "data" in kwargs:
+            kwargs.update(many=True, allow_empty=False, max_length=self.max_lessons)
+        return super().get_serializer(*args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
 @extend_schema(description="API для просмотра списка уроков.", tags=["Lessons"])
-class LessonListAPIView(generics.ListAPIView):
+class LessonListAPIView(
+    ConditionalGetMixin,
+    CachedReadMixin,
+    CursorModePaginationMixin,
+    generics.ListAPIView,
+):
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated, IsModeratorOrReadOnly]
     pagination_class = LessonPagination  # Добавляем пагинацию
+    cursor_pagination_class = LessonCursorPagination  # ?pagination=cursor
+    cache_name = "lesson"
+    query_budget = 5
 
-    def get_queryset(self):
+    def get_scope_queryset(self):
         user = self.request.user
 
         if user.is_moderator:
             return Lesson.objects.all()
         return Lesson.objects.filter(owner=user)
 
+    def get_queryset(self):
+        return self.get_scope_queryset()
+
 
 @extend_schema(description="API для просмотра урока.", tags=["Lessons"])
-class LessonRetrieveAPIView(generics.RetrieveAPIView):
+class LessonRetrieveAPIView(
+    ConditionalGetMixin, CachedReadMixin, generics.RetrieveAPIView
+):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated, IsModeratorOrReadOnly]
+    cache_name = "lesson"
+    query_budget = 3
+
+    def get_scope_queryset(self):
+        return Lesson.objects.all()
 
 
 @extend_schema(description="API для обновления урока.", tags=["Lessons"])
@@ -94,25 +229,37 @@ class LessonUpdateAPIView(generics.UpdateAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated, IsModeratorOrReadOnly | IsOwner]
+    query_budget = 7
 
 
 @extend_schema(description="API для удаления урока.", tags=["Lessons"])
 class LessonDestroyAPIView(generics.DestroyAPIView):
     queryset = Lesson.objects.all()
     permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = 7
 
 
 @extend_schema(
     description="API для просмотра списка платежей с фильтрацией и сортировкой.",
     tags=["Payments"],
 )
-class PaymentListView(generics.ListAPIView):
-    queryset = Payment.objects.all()
+class PaymentListView(CursorModePaginationMixin, generics.ListAPIView):
     serializer_class = PaymentSerializer
+    pagination_class = PaymentPagination
+    cursor_pagination_class = PaymentCursorPagination  # ?pagination=cursor
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ("paid_course", "paid_lesson", "payment_method")
+    filterset_fields = ("user", "paid_course", "paid_lesson", "payment_method")
     ordering_fields = ["payment_date"]
-    ordering = ["-payment_date"]
+    ordering = ["-payment_date", "-id"]
+    query_budget = 4
+
+    def get_queryset(self):
+        user = self.request.user
+
+        # Модераторы и администраторы видят все платежи, остальные — только свои
+        if user.is_staff or user.is_moderator:
+            return Payment.objects.all()
+        return Payment.objects.filter(user=user)
 
 
 @extend_schema(
@@ -122,40 +269,30 @@ class PaymentListView(generics.ListAPIView):
 class PaymentCreateView(generics.CreateAPIView):
     serializer_class = PaymentCreateSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 8
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        with transaction.atomic():
-            payment = serializer.save(user=self.request.user)
-
-            # Создаём продукт в Stripe
-            product_id = create_stripe_product(
-                payment.paid_course.title
-                if payment.paid_course
-                else payment.paid_lesson.title
-            )
-
-            # Создаём цену в Stripe (умножаем на 100, т.к. в копейках)
-            price_id = create_stripe_price(product_id, int(payment.amount * 100))
+        # Платёж сохраняется сразу (статус created), запросы к Stripe
+        # выполняются уже после коммита и не держат транзакцию открытой
+        payment = serializer.save(user=self.request.user)
 
-            # Создаём сессию оплаты
-            session_id, session_url = create_checkout_session(
-                price_id,
+        try:
+            session_id, session_url = start_checkout(
+                payment,
                 success_url="http://127.0.0.1:8000/payment-success/",
                 cancel_url="http://127.0.0.1:8000/payment-cancel/",
             )
-
-            # Сохраняем данные сессии в модель
-            payment.stripe_session_id = session_id
-            payment.stripe_session_url = session_url
-            payment.save()
+        except stripe.StripeError:
+            return Response(
+                {"error": "Payment provider is unavailable"},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
 
         # Возвращаем только session_url
-        return Response(
-            {"session_url": payment.stripe_session_url}, status=status.HTTP_201_CREATED
-        )
+        return Response({"session_url": session_url}, status=status.HTTP_201_CREATED)
 
 
 @extend_schema(
@@ -164,18 +301,139 @@ class PaymentCreateView(generics.CreateAPIView):
 )
 class PaymentStatusView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 3
 
     def get(self, request, session_id):
-        payment = Payment.objects.filter(
-            stripe_session_id=session_id, user=request.user
-        ).first()
-        if not payment:
+        key = payment_status_cache_key(session_id)
+        cached = cache.get(key) if settings.CACHE_ENABLED else None
+
+        if cached is None:
+            payment = Payment.objects.filter(
+                stripe_session_id=session_id, user=request.user
+            ).first()
+            if not payment:
+                return Response(
+                    {"error": "Payment not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+
+            if needs_stripe_refresh(payment):
+                try:
+                    apply_stripe_status(
+                        payment, get_checkout_session_status(session_id)
+                    )
+                except stripe.StripeError:
+                    pass  # Отдаём последний известный статус
+
+            cached = {"user_id": payment.user_id, "status": payment.stripe_status}
+            if settings.CACHE_ENABLED:
+                cache.set(key, cached, settings.PAYMENT_STATUS_CACHE_TIMEOUT)
+
+        if cached["user_id"] != request.user.id:
             return Response(
                 {"error": "Payment not found"}, status=status.HTTP_404_NOT_FOUND
             )
+        return Response({"status": cached["status"]}, status=status.HTTP_200_OK)
+
 
-        status_result = get_checkout_session_status(session_id)
-        return Response({"status": status_result}, status=status.HTTP_200_OK)
+NOT_AUTHENTICATED = {"detail": "Authentication credentials were not provided."}
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncPaymentCreateView(View):
+    """Оплата для ASGI-сервера: пока идут запросы к Stripe, поток не занят,
+    и процесс продолжает обслуживать другие запросы."""
+
+    # Как у PaymentCreateView плюс загрузка пользователя при JWT-аутентификации
+    query_budget = 9
+
+    async def post(self, request):
+        user = await aauthenticate(request)
+        if user is None:
+            return JsonResponse(NOT_AUTHENTICATED, status=401)
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error."}, status=400)
+
+        serializer = PaymentCreateSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=400)
+        payment = await sync_to_async(serializer.save)(user=user)
+
+        try:
+            session_id, session_url = await astart_checkout(
+                payment,
+                success_url="http://127.0.0.1:8000/payment-success/",
+                cancel_url="http://127.0.0.1:8000/payment-cancel/",
+            )
+        except stripe.StripeError:
+            return JsonResponse(
+                {"error": "Payment provider is unavailable"}, status=502
+            )
+        return JsonResponse({"session_url": session_url}, status=201)
+
+
+class AsyncPaymentStatusView(View):
+    """Статус платежа для ASGI-сервера: живой запрос в Stripe не занимает поток."""
+
+    query_budget = 3
+
+    async def get(self, request, session_id):
+        user = await aauthenticate(request)
+        if user is None:
+            return JsonResponse(NOT_AUTHENTICATED, status=401)
+
+        key = payment_status_cache_key(session_id)
+        cached = await cache.aget(key) if settings.CACHE_ENABLED else None
+
+        if cached is None:
+            payment = await Payment.objects.filter(
+                stripe_session_id=session_id, user=user
+            ).afirst()
+            if not payment:
+                return JsonResponse({"error": "Payment not found"}, status=404)
+
+            if needs_stripe_refresh(payment):
+                await release_db_connections()
+                try:
+                    stripe_status = await aget_checkout_session_status(session_id)
+                except stripe.StripeError:
+                    pass  # Отдаём последний известный статус
+                else:
+                    await sync_to_async(apply_stripe_status)(payment, stripe_status)
+
+            cached = {"user_id": payment.user_id, "status": payment.stripe_status}
+            if settings.CACHE_ENABLED:
+                await cache.aset(key, cached, settings.PAYMENT_STATUS_CACHE_TIMEOUT)
+
+        if cached["user_id"] != user.id:
+            return JsonResponse({"error": "Payment not found"}, status=404)
+        return JsonResponse({"status": cached["status"]})
+
+
+@extend_schema(
+    description="Вебхук Stripe: обновление статуса платежа.",
+    tags=["Payments"],
+)
+class StripeWebhookView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    query_budget = 3
+
+    def post(self, request):
+        if not webhook_enabled():
+            raise Http404
+        try:
+            event = construct_webhook_event(
+                request.body, request.headers.get("Stripe-Signature", "")
+            )
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response(
+                {"error": "Invalid signature"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        apply_checkout_event(event)
+        return Response(status=status.HTTP_200_OK)
 
 
 @extend_schema(
@@ -185,20 +443,49 @@ class PaymentStatusView(APIView):
 )
 class SubscriptionToggleView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 2
 
     def post(self, request, course_id):
-        user = request.user
-        course = get_object_or_404(Course, id=course_id)
+        # Удаление или создание подписки — один атомарный запрос
+        subscribed = Subscription.objects.toggle(request.user.id, course_id)
+
+        if subscribed is None:
+            return Response(
+                {"detail": "No Course matches the given query."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        message = "Подписка добавлена" if subscribed else "Подписка удалена"
 
-        # Ищем подписку
-        sub, created = Subscription.objects.get_or_create(user=user, course=course)
+        return Response({"message": message}, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    description="API для подписки или отписки от нескольких курсов одним запросом.",
+    tags=["Subscriptions"],
+    request=SubscriptionBulkSerializer,
+    responses={
+        200: {
+            "type": "object",
+            "properties": {
+                "course_ids": {"type": "array", "items": {"type": "integer"}}
+            },
+        }
+    },
+)
+class SubscriptionBulkView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 2
 
-        if not created:
-            # Подписка уже была — удаляем
-            sub.delete()
-            message = "Подписка удалена"
+    def post(self, request):
+        serializer = SubscriptionBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        action = serializer.validated_data["action"]
+        course_ids = serializer.validated_data["course_ids"]
+
+        # Возвращаются только курсы, подписка на которые действительно изменилась
+        if action == "subscribe":
+            changed = Subscription.objects.bulk_subscribe(request.user.id, course_ids)
         else:
-            # Подписка создана
-            message = "Подписка добавлена"
+            changed = Subscription.objects.bulk_unsubscribe(request.user.id, course_ids)
 
-        return Response({"message": message}, status=status.HTTP_200_OK)
+        return Response({"course_ids": changed}, status=status.HTTP_200_OK)
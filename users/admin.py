@@ -64,7 +64,8 @@ class PaymentAdmin(admin.ModelAdmin):
         "paid_lesson",
         "amount",
         "payment_method",
+        "status",
     )
-    list_filter = ("payment_method", "payment_date")
+    list_filter = ("payment_method", "status", "payment_date")
     search_fields = ("user__email", "paid_course__title", "paid_lesson__title")
-    readonly_fields = ("payment_date",)
+    readonly_fields = ("payment_date", "updated_at")
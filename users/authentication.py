@@ -0,0 +1,141 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+from .roles import get_group_names
+
+# Поля, из которых собирается пользователь запроса; пароль не кэшируется
+# и при обращении будет догружен из БД как отложенное поле
+CACHED_USER_FIELDS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "phone",
+    "city",
+    "avatar",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "last_login",
+    "date_joined",
+)
+
+LOCAL_CACHE_MAX_SIZE = 10000
+
+_local_cache = {}
+_local_cache_lock = threading.Lock()
+
+
+def user_cache_key(user_id):
+    return f"users:auth:{user_id}"
+
+
+def invalidate_cached_users(user_ids):
+    """
+    Сбрасывает закэшированных пользователей (локальный кэш и Redis).
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+    with _local_cache_lock:
+        for user_id in user_ids:
+            _local_cache.pop(user_id, None)
+    if settings.CACHE_ENABLED and user_ids:
+        cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+def _get_cached_payload(user_id):
+    now = time.monotonic()
+    with _local_cache_lock:
+        entry = _local_cache.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    payload = cache.get(user_cache_key(user_id))
+    if payload is not None:
+        _set_local_payload(user_id, payload)
+    return payload
+
+
+def _set_local_payload(user_id, payload):
+    expires_at = time.monotonic() + settings.AUTH_USER_LOCAL_CACHE_TIMEOUT
+    with _local_cache_lock:
+        if len(_local_cache) >= LOCAL_CACHE_MAX_SIZE:
+            _local_cache.clear()
+        _local_cache[user_id] = (expires_at, payload)
+
+
+def _cache_user(user_id, user):
+    payload = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+    payload["avatar"] = user.avatar.name or None
+    # Группы кэшируются вместе с пользователем — роль модератора без запросов
+    payload["group_names"] = list(get_group_names(user))
+    cache.set(user_cache_key(user_id), payload, settings.AUTH_USER_CACHE_TIMEOUT)
+    _set_local_payload(user_id, payload)
+
+
+def _build_user(payload):
+    # from_db ожидает значения в порядке полей модели
+    field_names = [
+        field.attname
+        for field in User._meta.concrete_fields
+        if field.attname in CACHED_USER_FIELDS
+    ]
+    user = User.from_db("default", field_names, [payload[name] for name in field_names])
+    user._group_names = frozenset(payload["group_names"])
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без запроса к таблице пользователей на каждом запросе.
+
+    Пользователь и его группы берутся из короткоживущего процессного кэша,
+    затем из Redis, и только при промахе — из БД. Кэш сбрасывается при
+    сохранении, удалении, изменении групп и деактивации пользователя.
+    Работает только при CACHE_ENABLED, иначе ведёт себя как JWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        # Для проверки отзыва токена нужен хэш пароля, который не кэшируется
+        if not settings.CACHE_ENABLED or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        user_id = str(user_id)
+
+        payload = _get_cached_payload(user_id)
+        if payload is None:
+            user = super().get_user(validated_token)
+            _cache_user(user_id, user)
+            return user
+
+        user = _build_user(payload)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+async def aauthenticate(request):
+    """
+    JWT-аутентификация для async-представлений вне DRF. Возвращает
+    пользователя или None и, как DRF, записывает пользователя в request.user.
+    """
+    try:
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed:
+        return None
+    if result is None:
+        return None
+    request.user = result[0]
+    return result[0]
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hashing_executor():
+    """Общий пул потоков для хэширования паролей (не больше PASSWORD_HASHING_WORKERS)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    thread_name_prefix="password-hashing",
+                )
+    return _executor
+
+
+def hash_password(raw_password):
+    """Хэширует пароль в общем пуле: одновременно считается не больше
+    PASSWORD_HASHING_WORKERS хэшей, остальные запросы не лишаются CPU."""
+    return get_hashing_executor().submit(make_password, raw_password).result()
+
+
+async def ahash_password(raw_password):
+    """Асинхронный вариант hash_password: цикл событий не блокируется."""
+    return await asyncio.wrap_future(
+        get_hashing_executor().submit(make_password, raw_password)
+    )
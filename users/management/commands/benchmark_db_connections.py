@@ -0,0 +1,81 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.postgresql.base import DatabaseWrapper
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures per-request connection overhead: a new connection per request, "
+        "persistent connections (CONN_MAX_AGE) and a psycopg pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Simulated requests per mode"
+        )
+
+    def handle(self, *args, **options):
+        base = copy.deepcopy(connections["default"].settings_dict)
+        base["OPTIONS"].pop("pool", None)
+
+        modes = {
+            "new connection": {"CONN_MAX_AGE": 0},
+            "persistent": {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True},
+            "pool": {
+                "CONN_MAX_AGE": 0,
+                "OPTIONS": {
+                    **base["OPTIONS"],
+                    "pool": {"min_size": 1, "max_size": 1},
+                },
+            },
+        }
+
+        self.stdout.write(f"{'mode':<18}{'p50 ms':>9}{'p95 ms':>9}{'backends':>10}")
+        for name, overrides in modes.items():
+            alias = f"benchmark_{name.replace(' ', '_')}"
+            settings_dict = {**base, **overrides}
+            # Временное подключение регистрируется, как будто оно есть в DATABASES
+            connections.settings[alias] = settings_dict
+            wrapper = DatabaseWrapper(settings_dict, alias=alias)
+            connections[alias] = wrapper
+            try:
+                durations, backends = self.simulate(wrapper, options["requests"])
+            except Exception as e:
+                # Например, не установлен psycopg-pool
+                self.stdout.write(self.style.WARNING(f"{name:<18}пропущен: {e}"))
+                continue
+            finally:
+                wrapper.close()
+                if "pool" in settings_dict["OPTIONS"]:
+                    wrapper.close_pool()
+                del connections[alias]
+                del connections.settings[alias]
+
+            p95 = statistics.quantiles(durations, n=20)[18]
+            self.stdout.write(
+                f"{name:<18}{statistics.median(durations):>9.2f}{p95:>9.2f}"
+                f"{backends:>10}"
+            )
+
+    def simulate(self, wrapper, count):
+        """
+        Жизненный цикл соединения в запросе Django: close_old_connections на
+        request_started и request_finished, между ними — один SQL-запрос.
+        Возвращает длительности запросов и число открытых серверных процессов
+        PostgreSQL (новых соединений).
+        """
+        durations = []
+        backend_pids = set()
+        for _ in range(count):
+            started = time.perf_counter()
+            wrapper.close_if_unusable_or_obsolete()
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid()")
+                backend_pids.add(cursor.fetchone()[0])
+            wrapper.close_if_unusable_or_obsolete()
+            durations.append((time.perf_counter() - started) * 1000)
+        return durations, len(backend_pids)
@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares password hashers from PASSWORD_HASHERS: time per hash and throughput"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations", type=int, default=10, help="Hashes per hasher"
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        workers = settings.PASSWORD_HASHING_WORKERS
+        self.stdout.write(
+            f"{'algorithm':<22}{'ms/hash':>10}{f'hash/s ({workers} thr)':>20}"
+        )
+
+        seen = set()
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            # Настроенные и стандартные варианты одного алгоритма — один раз
+            if hasher.algorithm in seen:
+                continue
+            seen.add(hasher.algorithm)
+
+            if hasher.library:
+                try:
+                    hasher._load_library()
+                except ValueError:
+                    library = hasher.library
+                    if isinstance(library, tuple):
+                        library = library[1]
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"{hasher.algorithm:<22}пропущен: не установлена "
+                            f"библиотека {library}"
+                        )
+                    )
+                    continue
+
+            def encode(_):
+                return hasher.encode("benchmark-password", hasher.salt())
+
+            # Последовательно — задержка одной регистрации
+            start = time.perf_counter()
+            for i in range(iterations):
+                encode(i)
+            per_hash = (time.perf_counter() - start) / iterations
+
+            # В пуле потоков, как при хэшировании в запросах
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                start = time.perf_counter()
+                list(executor.map(encode, range(iterations)))
+                throughput = iterations / (time.perf_counter() - start)
+
+            self.stdout.write(
+                f"{hasher.algorithm:<22}{per_hash * 1000:>10.1f}{throughput:>20.1f}"
+            )
@@ -14,35 +14,33 @@ class Command(BaseCommand):
         db_host = db_settings["HOST"]
         db_port = db_settings["PORT"]
 
-        # Подключаемся к PostgreSQL (нужно подключиться к служебной базе, например, postgres)
-        conn = psycopg.connect(
+        # Подключаемся к PostgreSQL (нужно подключиться к служебной базе, например, postgres).
+        # Соединение одноразовое: закрывается при выходе из блока, в том числе при ошибке
+        with psycopg.connect(
             dbname="postgres",  # Подключаемся к служебной базе
             user=db_user,
             password=db_password,
             host=db_host,
             port=db_port,
-        )
-        conn.autocommit = True  # Нужно для выполнения CREATE DATABASE
-        cursor = conn.cursor()
-
-        # Проверяем, существует ли база данных
-        cursor.execute(
-            "SELECT 1 FROM pg_catalog.pg_database WHERE datname = %s", (db_name,)
-        )
-        exists = cursor.fetchone()
+            autocommit=True,  # Нужно для выполнения CREATE DATABASE
+        ) as conn, conn.cursor() as cursor:
+            # Проверяем, существует ли база данных
+            cursor.execute(
+                "SELECT 1 FROM pg_catalog.pg_database WHERE datname = %s", (db_name,)
+            )
+            exists = cursor.fetchone()
 
-        if not exists:
-            try:
-                cursor.execute(f"CREATE DATABASE {db_name};")
+            if not exists:
+                try:
+                    cursor.execute(f"CREATE DATABASE {db_name};")
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f'Database "{db_name}" created successfully.'
+                        )
+                    )
+                except psycopg.Error as e:
+                    self.stdout.write(self.style.ERROR(f"Error creating database: {e}"))
+            else:
                 self.stdout.write(
-                    self.style.SUCCESS(f'Database "{db_name}" created successfully.')
+                    self.style.WARNING(f'Database "{db_name}" already exists.')
                 )
-            except psycopg.Error as e:
-                self.stdout.write(self.style.ERROR(f"Error creating database: {e}"))
-        else:
-            self.stdout.write(
-                self.style.WARNING(f'Database "{db_name}" already exists.')
-            )
-
-        cursor.close()
-        conn.close()
@@ -0,0 +1,219 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from courses.models import Course, Lesson, Subscription
+from users.models import Payment, User
+
+
+def zipf_cum_weights(size, exponent=1.1):
+    """
+    Накопленные веса распределения Ципфа: немногие элементы получают
+    большую часть выборок (популярные курсы, активные пользователи).
+    """
+    return list(accumulate(1 / rank**exponent for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a synthetic dataset (users, courses, lessons, subscriptions, "
+        "payments) with skewed popularity for load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--courses", type=int, default=100)
+        parser.add_argument(
+            "--lessons", type=int, default=10, help="Average lessons per course"
+        )
+        parser.add_argument(
+            "--subscriptions",
+            type=int,
+            default=5,
+            help="Average subscriptions per user",
+        )
+        parser.add_argument("--payments", type=int, default=5000)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--password", default="loadtest123", help="Password of every user"
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.monotonic()
+
+        user_ids = self.create_users(options["users"], options["password"])
+        course_ids = self.create_courses(options["courses"], user_ids)
+        lesson_ids = self.create_lessons(course_ids, options["lessons"])
+        self.create_subscriptions(user_ids, course_ids, options["subscriptions"])
+        self.create_payments(options["payments"], user_ids, course_ids, lesson_ids)
+
+        # Подписки созданы bulk_create без сигналов — пересчитываем счётчики
+        for i in range(0, len(course_ids), self.batch_size):
+            batch = course_ids[i : i + self.batch_size]
+            Course.objects.filter(id__in=batch).reconcile_counters()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Dataset generated in {time.monotonic() - started:.1f} s. "
+                f"Log in as {self.top_user_email} / {options['password']}"
+            )
+        )
+
+    def bulk_create(self, queryset, objs, **kwargs):
+        """
+        Создаёт объекты из итератора пачками по batch_size, возвращает их id.
+        В памяти одновременно только одна пачка объектов.
+        """
+        ids = []
+        objs = iter(objs)
+        while batch := list(islice(objs, self.batch_size)):
+            ids.extend(obj.pk for obj in queryset.bulk_create(batch, **kwargs))
+        return ids
+
+    def report(self, name, count, started):
+        self.stdout.write(f"{name}: {count} in {time.monotonic() - started:.1f} s")
+
+    def create_users(self, count, password):
+        started = time.monotonic()
+        # Хэш одинаковый у всех пользователей — считается один раз
+        password_hash = make_password(password)
+        tag = uuid.uuid4().hex[:6]
+        now = timezone.now()
+
+        def users():
+            for i in range(count):
+                days_ago = self.rng.randint(0, 730)
+                yield User(
+                    email=f"load-{tag}-{i}@example.com",
+                    password=password_hash,
+                    phone=f"+7900{i:07d}",
+                    city=self.rng.choice(
+                        ["Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Омск"]
+                    ),
+                    date_joined=now - timedelta(days=days_ago),
+                    # Часть пользователей ни разу не входила
+                    last_login=(
+                        now - timedelta(days=self.rng.randint(0, days_ago))
+                        if self.rng.random() < 0.8
+                        else None
+                    ),
+                )
+
+        ids = self.bulk_create(User.objects, users())
+        # Первый пользователь — самый активный автор и покупатель
+        self.top_user_email = f"load-{tag}-0@example.com"
+        self.report("Users", len(ids), started)
+        return ids
+
+    def create_courses(self, count, user_ids):
+        started = time.monotonic()
+        # Курсы создают немногие авторы, первые из них — самые активные
+        authors = user_ids[: max(1, len(user_ids) // 50)]
+        owners = self.rng.choices(
+            authors, cum_weights=zipf_cum_weights(len(authors)), k=count
+        )
+        courses = [
+            Course(
+                title=f"Course {i}",
+                description="Synthetic course " * 20,
+                owner_id=owner_id,
+            )
+            for i, owner_id in enumerate(owners)
+        ]
+        ids = self.bulk_create(Course.objects, courses)
+        self.course_owners = dict(zip(ids, owners))
+        self.report("Courses", len(ids), started)
+        return ids
+
+    def create_lessons(self, course_ids, average):
+        started = time.monotonic()
+
+        def lessons():
+            for course_id in course_ids:
+                for j in range(self.rng.randint(1, max(1, average * 2 - 1))):
+                    yield Lesson(
+                        title=f"Lesson {j}",
+                        description="Synthetic lesson " * 10,
+                        video_url="https://youtube.com/watch?v=loadtest",
+                        course_id=course_id,
+                        owner_id=self.course_owners[course_id],
+                    )
+
+        # LessonQuerySet.bulk_create обновляет lessons_count курсов
+        ids = self.bulk_create(Lesson.objects, lessons())
+        self.report("Lessons", len(ids), started)
+        return ids
+
+    def create_subscriptions(self, user_ids, course_ids, average):
+        started = time.monotonic()
+        weights = zipf_cum_weights(len(course_ids))
+
+        def subscriptions():
+            for user_id in user_ids:
+                count = min(int(self.rng.expovariate(1 / average)), len(course_ids))
+                for course_id in set(
+                    self.rng.choices(course_ids, cum_weights=weights, k=count)
+                ):
+                    yield Subscription(user_id=user_id, course_id=course_id)
+
+        ids = self.bulk_create(
+            Subscription.objects, subscriptions(), ignore_conflicts=True
+        )
+        self.report("Subscriptions", len(ids), started)
+
+    def create_payments(self, count, user_ids, course_ids, lesson_ids):
+        started = time.monotonic()
+        user_weights = zipf_cum_weights(len(user_ids))
+        course_weights = zipf_cum_weights(len(course_ids))
+
+        def payments():
+            for _ in range(count):
+                by_course = self.rng.random() < 0.8
+                yield Payment(
+                    user_id=self.rng.choices(user_ids, cum_weights=user_weights)[0],
+                    paid_course_id=(
+                        self.rng.choices(course_ids, cum_weights=course_weights)[0]
+                        if by_course
+                        else None
+                    ),
+                    paid_lesson_id=None if by_course else self.rng.choice(lesson_ids),
+                    amount=Decimal(self.rng.choice([500, 990, 1500, 4990, 9900])),
+                    payment_method=self.rng.choice(
+                        [Payment.PAYMENT_CASH, Payment.PAYMENT_TRANSFER]
+                    ),
+                    status=self.rng.choices(
+                        [
+                            Payment.STATUS_PAID,
+                            Payment.STATUS_PENDING,
+                            Payment.STATUS_FAILED,
+                        ],
+                        weights=[90, 5, 5],
+                    )[0],
+                )
+
+        ids = self.bulk_create(Payment.objects, payments())
+
+        # payment_date заполняется auto_now_add — разносим даты за последний год
+        # (недавних платежей больше), setseed делает разброс повторяемым
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT setseed(%s)", [self.rng.random()])
+        for i in range(0, len(ids), self.batch_size):
+            batch = ids[i : i + self.batch_size]
+            Payment.objects.filter(id__in=batch).update(
+                payment_date=RawSQL(
+                    "now() - power(random(), 2) * interval '365 days'", []
+                )
+            )
+        self.report("Payments", len(ids), started)
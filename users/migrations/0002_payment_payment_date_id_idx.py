@@ -0,0 +1,22 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:18
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("courses", "0004_course_course_created_id_idx_and_more"),
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(
+                fields=["-payment_date", "-id"], name="payment_date_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:19
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("courses", "0004_course_course_created_id_idx_and_more"),
+        ("users", "0002_payment_payment_date_id_idx"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(
+                fields=["user", "-payment_date", "-id"], name="payment_user_date_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(
+                fields=["payment_method", "-payment_date"],
+                name="payment_method_date_idx",
+            ),
+        ),
+    ]
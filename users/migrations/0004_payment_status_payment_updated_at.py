@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_payment_payment_user_date_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("created", "Создан"),
+                    ("pending", "Ожидает оплаты"),
+                    ("paid", "Оплачен"),
+                    ("failed", "Ошибка"),
+                ],
+                default="created",
+                max_length=10,
+                verbose_name="Статус платежа",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+        ),
+    ]
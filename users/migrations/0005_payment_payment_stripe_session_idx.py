@@ -0,0 +1,22 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:23
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("courses", "0005_stripeprice"),
+        ("users", "0004_payment_status_payment_updated_at"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(
+                fields=["stripe_session_id"], name="payment_stripe_session_idx"
+            ),
+        ),
+    ]
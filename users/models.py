@@ -1,13 +1,16 @@
 from decimal import Decimal
 
-from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import OpClass
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import Upper
 
 from courses.models import Course, Lesson
 
+from . import roles
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -54,11 +57,34 @@ class User(AbstractUser):
 
     @property
     def is_moderator(self):
-        return self.groups.filter(name=settings.MODERATOR_GROUP_NAME).exists()
+        # Группы загружаются один раз на запрос, см. users.roles
+        return roles.is_moderator(self)
 
     class Meta:
         verbose_name = "Ученик"
         verbose_name_plural = "Ученики"
+        indexes = [
+            # Поиск неактивных пользователей для деактивации (users.tasks)
+            models.Index(
+                fields=["last_login"],
+                condition=models.Q(is_active=True),
+                name="user_active_last_login_idx",
+            ),
+            models.Index(
+                fields=["date_joined"],
+                condition=models.Q(is_active=True, last_login__isnull=True),
+                name="user_never_logged_in_idx",
+            ),
+            # Поиск по началу email/города без учёта регистра (istartswith)
+            models.Index(
+                OpClass(Upper("email"), name="text_pattern_ops"),
+                name="user_email_prefix_idx",
+            ),
+            models.Index(
+                OpClass(Upper("city"), name="text_pattern_ops"),
+                name="user_city_prefix_idx",
+            ),
+        ]
 
 
 class Payment(models.Model):
@@ -70,6 +96,18 @@ class Payment(models.Model):
         (PAYMENT_TRANSFER, "Перевод на счёт"),
     ]
 
+    STATUS_CREATED = "created"
+    STATUS_PENDING = "pending"
+    STATUS_PAID = "paid"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_CREATED, "Создан"),
+        (STATUS_PENDING, "Ожидает оплаты"),
+        (STATUS_PAID, "Оплачен"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -105,11 +143,44 @@ class Payment(models.Model):
     stripe_session_url = models.URLField(max_length=500, blank=True, null=True)
     stripe_status = models.CharField(blank=True, null=True)
 
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_CREATED,
+        verbose_name="Статус платежа",
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
     def __str__(self):
         return (
             f"{self.user.email} - {self.amount} ({self.get_payment_method_display()})"
         )
 
+    def set_status(self, status, **fields):
+        """
+        Фиксирует переход платежа в новый статус вместе с сопутствующими полями.
+        """
+        self.status = status
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.save(update_fields=["status", "updated_at", *fields])
+
     class Meta:
         verbose_name = "Платёж"
         verbose_name_plural = "Платежи"
+        indexes = [
+            # Курсорная пагинация (ORDER BY -payment_date, -id)
+            models.Index(fields=["-payment_date", "-id"], name="payment_date_id_idx"),
+            # Платежи пользователя и фильтр по способу оплаты
+            models.Index(
+                fields=["user", "-payment_date", "-id"], name="payment_user_date_idx"
+            ),
+            models.Index(
+                fields=["payment_method", "-payment_date"],
+                name="payment_method_date_idx",
+            ),
+            # Поиск платежа по сессии Stripe (статус, вебхуки)
+            models.Index(
+                fields=["stripe_session_id"], name="payment_stripe_session_idx"
+            ),
+        ]
@@ -0,0 +1,8 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    page_size = 20  # Количество пользователей на странице
+    page_size_query_param = "page_size"
+    max_page_size = 100  # Максимальное количество на странице
+    ordering = ("id",)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+def group_names_cache_key(user_id):
+    return f"users:group_names:{user_id}"
+
+
+def get_group_names(user):
+    """
+    Возвращает названия групп пользователя.
+
+    Группы загружаются один раз на объект пользователя (т.е. один раз за запрос),
+    а при включённом кэше дополнительно хранятся в Redis до изменения групп.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    group_names = getattr(user, "_group_names", None)
+    if group_names is not None:
+        return group_names
+
+    key = group_names_cache_key(user.pk)
+    names = cache.get(key) if settings.CACHE_ENABLED else None
+    if names is None:
+        names = list(user.groups.values_list("name", flat=True))
+        if settings.CACHE_ENABLED:
+            cache.set(key, names, settings.USER_ROLES_CACHE_TIMEOUT)
+
+    user._group_names = frozenset(names)
+    return user._group_names
+
+
+def is_moderator(user):
+    return settings.MODERATOR_GROUP_NAME in get_group_names(user)
+
+
+def invalidate_group_names(user_ids):
+    """
+    Сбрасывает закэшированные группы пользователей.
+    """
+    if settings.CACHE_ENABLED and user_ids:
+        cache.delete_many([group_names_cache_key(user_id) for user_id in user_ids])
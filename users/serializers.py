@@ -1,6 +1,13 @@
-from django.contrib.auth.hashers import make_password
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.urls import reverse
 from rest_framework import serializers
 
+from courses.services.thumbnail_service import thumbnail_urls
+from users.hashing import hash_password
 from users.models import Payment, User
 
 
@@ -15,6 +22,14 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
         model = Payment
         fields = ("paid_course", "paid_lesson", "amount", "payment_method")
 
+    def validate(self, attrs):
+        # Платёж сохраняется до запроса в Stripe, поэтому товар проверяется здесь
+        if bool(attrs.get("paid_course")) == bool(attrs.get("paid_lesson")):
+            raise serializers.ValidationError(
+                "Укажите либо курс (paid_course), либо урок (paid_lesson)."
+            )
+        return attrs
+
 
 class UserRegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -25,26 +40,65 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         extra_kwargs = {"password": {"write_only": True}}
 
     def create(self, validated_data):
-        validated_data["password"] = make_password(validated_data["password"])
+        # Асинхронная регистрация передаёт уже захэшированный пароль
+        if not validated_data.pop("password_is_hashed", False):
+            validated_data["password"] = hash_password(validated_data["password"])
         return super().create(validated_data)
 
 
 class UserPrivateSerializer(serializers.ModelSerializer):
-    payments = PaymentSerializer(many=True, read_only=True)
+    payments = serializers.SerializerMethodField()
+    payments_summary = serializers.SerializerMethodField()
+    payments_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ("id", "email", "password", "phone", "city", "avatar", "payments")
+        fields = (
+            "id",
+            "email",
+            "password",
+            "phone",
+            "city",
+            "avatar",
+            "payments",
+            "payments_summary",
+            "payments_url",
+        )
         extra_kwargs = {"password": {"write_only": True}}
 
+    def get_payments(self, instance):
+        # Только последние платежи, полная история — по ссылке payments_url
+        payments = instance.payments.order_by("-payment_date", "-id")[
+            : settings.PROFILE_PAYMENTS_LIMIT
+        ]
+        return PaymentSerializer(payments, many=True, context=self.context).data
+
+    def get_payments_summary(self, instance):
+        # Количество и сумма платежей одним запросом
+        summary = instance.payments.aggregate(
+            count=Count("id"), total_amount=Coalesce(Sum("amount"), Decimal("0"))
+        )
+        # Сумма в том же строковом формате, что и amount в платежах
+        summary["total_amount"] = f"{summary['total_amount']:.2f}"
+        return summary
+
+    def get_payments_url(self, instance):
+        url = f"{reverse('courses:payment-list')}?user={instance.pk}"
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
     def update(self, instance, validated_data):
         if "password" in validated_data:
-            validated_data["password"] = make_password(validated_data["password"])
+            validated_data["password"] = hash_password(validated_data["password"])
         return super().update(instance, validated_data)
 
 
 class UserPublicSerializer(serializers.ModelSerializer):
+    avatar_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ["id", "email", "phone", "city", "avatar"]
+        fields = ["id", "email", "phone", "city", "avatar", "avatar_thumbnails"]
+
+    def get_avatar_thumbnails(self, instance):
+        return thumbnail_urls(instance.avatar, self.context.get("request"))
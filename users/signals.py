@@ -0,0 +1,74 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from courses.services.thumbnail_service import has_new_upload
+from courses.tasks import schedule_thumbnails
+
+from .authentication import invalidate_cached_users
+from .models import User
+from .roles import invalidate_group_names
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_cached_user(sender, instance, **kwargs):
+    """
+    Сбрасывает пользователя в кэше аутентификации при изменении или удалении.
+    """
+    invalidate_cached_users([instance.pk])
+
+
+@receiver(pre_save, sender=User)
+def remember_new_avatar(sender, instance, **kwargs):
+    # После сохранения файл уже в хранилище — новую загрузку видно только здесь
+    instance._new_images = ["avatar"] if has_new_upload(instance, "avatar") else []
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_thumbnails(sender, instance, **kwargs):
+    """
+    Ставит в очередь создание миниатюр нового аватара.
+    """
+    schedule_thumbnails(instance, getattr(instance, "_new_images", []))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def reset_user_group_names(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Сбрасывает кэш групп при изменении состава групп пользователя.
+    """
+    if not reverse:
+        # user.groups.add(...) / remove(...) / clear()
+        if action in ("post_add", "post_remove", "post_clear"):
+            instance.__dict__.pop("_group_names", None)
+            _invalidate_users([instance.pk])
+        return
+
+    # group.user_set.add(...) / remove(...) / clear()
+    if action == "pre_clear":
+        _invalidate_users(list(instance.user_set.values_list("pk", flat=True)))
+    elif action in ("post_add", "post_remove"):
+        _invalidate_users(list(pk_set))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def reset_group_members_names(sender, instance, **kwargs):
+    """
+    Сбрасывает кэш групп у участников переименованной или удалённой группы.
+    """
+    if instance.pk:
+        _invalidate_users(list(instance.user_set.values_list("pk", flat=True)))
+
+
+def _invalidate_users(user_ids):
+    # Группы хранятся и в кэше ролей, и в кэше аутентификации
+    invalidate_group_names(user_ids)
+    invalidate_cached_users(user_ids)
@@ -1,10 +1,16 @@
 import logging
+import time
 from datetime import timedelta
 
 from celery import shared_task
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
+from .authentication import invalidate_cached_users
+
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
@@ -13,23 +19,60 @@ logger = logging.getLogger(__name__)
 def deactivate_inactive_users():
     """
     Задача деактивации пользователей, которые не заходили более месяца.
+
+    Пользователи, ни разу не входившие в систему, деактивируются через месяц
+    после регистрации. Обновление идёт пачками по диапазонам id, каждая пачка —
+    в отдельной короткой транзакции, чтобы не блокировать таблицу надолго.
     """
+    started = time.monotonic()
     one_month_ago = timezone.now() - timedelta(days=30)
+    batch_size = settings.DEACTIVATE_USERS_BATCH_SIZE
 
+    # Условия покрыты частичными индексами user_active_last_login_idx
+    # и user_never_logged_in_idx
     users_to_deactivate = User.objects.filter(
-        last_login__lt=one_month_ago,
+        Q(last_login__lt=one_month_ago)
+        | Q(last_login__isnull=True, date_joined__lt=one_month_ago),
         is_active=True,
         is_staff=False,  # Не деактивируем администраторов
         is_superuser=False,  # Не деактивируем суперпользователей
     )
 
-    updated_count = users_to_deactivate.update(is_active=False)
+    updated_count = 0
+    batches = 0
+    last_id = 0
+    while True:
+        batch_ids = list(
+            users_to_deactivate.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not batch_ids:
+            break
+
+        batch_started = time.monotonic()
+        with transaction.atomic():
+            # Условия проверяются повторно: пользователь мог успеть войти
+            batch_count = users_to_deactivate.filter(
+                id__gt=last_id, id__lte=batch_ids[-1]
+            ).update(is_active=False)
+        # update() не отправляет сигналов — сбрасываем кэш аутентификации сами
+        invalidate_cached_users(batch_ids)
+
+        batches += 1
+        updated_count += batch_count
+        last_id = batch_ids[-1]
+        logger.info(
+            f"Пачка {batches}: деактивировано {batch_count} пользователей "
+            f"(id до {last_id}) за {time.monotonic() - batch_started:.3f} с."
+        )
 
     print(
         f"Деактивировано {updated_count} пользователей, которые не заходили более месяца."
     )  # Только для отладки
 
     logger.info(
-        f"Деактивировано {updated_count} пользователей, которые не заходили более месяца."
+        f"Деактивировано {updated_count} пользователей, которые не заходили более месяца "
+        f"({batches} пачек за {time.monotonic() - started:.3f} с)."
     )
     return f"Деактивировано {updated_count} пользователей."
@@ -1,9 +1,26 @@
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from courses.models import Course, Lesson
+from courses.services.thumbnail_service import thumbnail_name
+from courses.tasks import generate_thumbnails_task
 from users.models import Payment
+from users.tasks import deactivate_inactive_users
 
 User = get_user_model()
 
@@ -31,6 +48,41 @@ class UserTestCase(APITestCase):
             city="Киров",
         )
 
+    def test_user_list_search_and_cursor_pagination(self):
+        """Список пользователей: поиск по началу email и курсорная пагинация"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/users/?search=OTHER")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["results"]
+        self.assertEqual([user["email"] for user in results], ["other@example.com"])
+        self.assertNotIn("password", results[0])
+
+        response = self.client.get("/users/?page_size=2")
+        page = response.json()
+        self.assertEqual(len(page["results"]), 2)
+        self.assertNotIn("count", page)
+        response = self.client.get(page["next"])
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    @patch("courses.tasks.generate_thumbnails_task.delay")
+    def test_avatar_thumbnails(self, mock_delay):
+        """Миниатюры аватара (PNG с прозрачностью) в публичном профиле"""
+        mock_delay.side_effect = generate_thumbnails_task
+        buffer = BytesIO()
+        Image.new("LA", (300, 600)).save(buffer, "PNG")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_user.avatar = SimpleUploadedFile("me.png", buffer.getvalue())
+            self.other_user.save()
+
+        path = thumbnail_name(self.other_user.avatar.name, "small")
+        with default_storage.open(path) as thumbnail, Image.open(thumbnail) as image:
+            self.assertEqual((image.size, image.mode), ((80, 160), "RGBA"))
+
+        self.client.force_authenticate(user=self.user)
+        data = self.client.get(f"/users/{self.other_user.id}/").json()
+        self.assertTrue(data["avatar_thumbnails"]["small"].endswith(path))
+
     def test_register_user(self):
         """Тестирование регистрации пользователя"""
         data = {
@@ -45,6 +97,25 @@ class UserTestCase(APITestCase):
         self.assertIn("refresh", response.json())
         self.assertTrue(User.objects.filter(email="newuser@example.com").exists())
 
+    def test_register_user_async(self):
+        """Асинхронная регистрация: пароль хэшируется один раз и проверяется"""
+        data = {
+            "email": "asyncuser@example.com",
+            "password": "newpass123",
+            "phone": "+79001113345",
+            "city": "Омск",
+        }
+        response = self.client.post("/register/async/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("access", response.json())
+        user = User.objects.get(email="asyncuser@example.com")
+        self.assertTrue(user.check_password("newpass123"))
+
+        # Повторная регистрация с тем же email — ошибка валидации
+        response = self.client.post("/register/async/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.json())
+
     def test_login_user(self):
         """Тестирование входа пользователя"""
         data = {"email": "user@example.com", "password": "password123"}
@@ -60,6 +131,39 @@ class UserTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["email"], "user@example.com")
 
+    @override_settings(PROFILE_PAYMENTS_LIMIT=3)
+    def test_profile_embeds_latest_payments_and_summary(self):
+        """Профиль содержит последние платежи, итоги и ссылку на историю"""
+        course = Course.objects.create(
+            title="Python Basics", description="...", owner=self.user
+        )
+        for amount in range(1, 6):
+            Payment.objects.create(
+                user=self.user,
+                paid_course=course,
+                amount=amount * 100,
+                payment_method="cash",
+            )
+        self.client.force_authenticate(user=self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f"/users/{self.user.id}/")
+        data = response.json()
+        self.assertEqual(len(data["payments"]), 3)
+        self.assertEqual(data["payments"][0]["amount"], "500.00")
+        self.assertEqual(
+            data["payments_summary"], {"count": 5, "total_amount": "1500.00"}
+        )
+        self.assertTrue(
+            data["payments_url"].endswith(f"/payments/?user={self.user.id}")
+        )
+        user_queries = [
+            query
+            for query in context.captured_queries
+            if query["sql"].startswith('SELECT "users_user"')
+        ]
+        self.assertEqual(len(user_queries), 1)  # Профиль загружается один раз
+
     def test_update_own_profile(self):
         """Тестирование обновления собственного профиля"""
         self.client.force_authenticate(user=self.user)
@@ -129,9 +233,7 @@ class PaymentTestCase(APITestCase):
         )
         response = self.client.get(f"/payments/?paid_course={self.course.id}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        # Проверяем, что возвращается список (без пагинации)
-        data = response.json()
-        self.assertIsInstance(data, list)
+        data = response.json()["results"]
         self.assertEqual(len(data), 1)  # Один платеж
 
     def test_order_payments_by_date(self):
@@ -151,6 +253,136 @@ class PaymentTestCase(APITestCase):
         )
         response = self.client.get("/payments/?ordering=payment_date")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        data = response.json()
-        self.assertIsInstance(data, list)
+        data = response.json()["results"]
         self.assertLessEqual(data[0]["payment_date"], data[1]["payment_date"])
+
+    def test_payments_scoped_to_user(self):
+        """Пользователь видит только свои платежи, администратор — все"""
+        other_user = User.objects.create_user(
+            email="other@example.com", password="password123"
+        )
+        admin = User.objects.create_superuser(
+            email="admin@example.com", password="admin123"
+        )
+        Payment.objects.create(
+            user=self.user, paid_course=self.course, amount=100, payment_method="cash"
+        )
+        Payment.objects.create(
+            user=other_user, paid_course=self.course, amount=200, payment_method="cash"
+        )
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/payments/")
+        self.assertEqual(response.json()["count"], 1)
+
+        self.client.force_authenticate(user=admin)
+        response = self.client.get("/payments/")
+        self.assertEqual(response.json()["count"], 2)
+
+
+class UserRolesTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            password="password123",
+        )
+        self.group, created = Group.objects.get_or_create(name="Модераторы")
+
+    def test_groups_loaded_once_per_instance(self):
+        """Группы пользователя запрашиваются один раз на объект"""
+        with self.assertNumQueries(1):
+            self.assertFalse(self.user.is_moderator)
+            self.assertFalse(self.user.is_moderator)
+
+    def test_group_change_resets_instance_cache(self):
+        """Добавление в группу сбрасывает закэшированные роли"""
+        self.assertFalse(self.user.is_moderator)
+        self.user.groups.add(self.group)
+        self.assertTrue(self.user.is_moderator)
+
+    @override_settings(CACHE_ENABLED=True)
+    def test_groups_cached_between_requests(self):
+        """При включённом кэше группы берутся из кэша и сбрасываются по сигналу"""
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_moderator)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(user.is_moderator)
+
+        self.group.user_set.add(self.user)
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_moderator)
+
+
+class DeactivateInactiveUsersTestCase(TestCase):
+
+    def _create_user(self, email, last_login=None, joined_days_ago=60, **extra):
+        user = User.objects.create_user(email=email, password="password123", **extra)
+        User.objects.filter(pk=user.pk).update(
+            last_login=last_login,
+            date_joined=timezone.now() - timedelta(days=joined_days_ago),
+        )
+        return user
+
+    @override_settings(DEACTIVATE_USERS_BATCH_SIZE=2)
+    def test_inactive_users_deactivated_in_batches(self):
+        """Неактивные и ни разу не входившие пользователи деактивируются пачками"""
+        long_ago = timezone.now() - timedelta(days=45)
+        inactive = [
+            self._create_user(f"old{i}@example.com", last_login=long_ago)
+            for i in range(3)
+        ]
+        never_logged_in = self._create_user("never@example.com")
+        recent = self._create_user("recent@example.com", last_login=timezone.now())
+        new_user = self._create_user("new@example.com", joined_days_ago=1)
+        staff = self._create_user(
+            "staff@example.com", last_login=long_ago, is_staff=True
+        )
+
+        result = deactivate_inactive_users()
+
+        self.assertEqual(result, "Деактивировано 4 пользователей.")
+        deactivated = set(
+            User.objects.filter(is_active=False).values_list("pk", flat=True)
+        )
+        self.assertEqual(
+            deactivated, {user.pk for user in [*inactive, never_logged_in]}
+        )
+        for user in (recent, new_user, staff):
+            self.assertNotIn(user.pk, deactivated)
+
+
+@override_settings(CACHE_ENABLED=True)
+class CachedJWTAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        response = self.client.post(
+            "/login/", data={"email": "user@example.com", "password": "password123"}
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}"
+        )
+
+    def test_cached_user_needs_no_auth_queries(self):
+        """Повторный запрос аутентифицируется без обращения к таблице пользователей"""
+        self.assertEqual(self.client.get("/lessons/").status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/lessons/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tables = " ".join(query["sql"] for query in context.captured_queries)
+        self.assertNotIn('"users_user"', tables)
+        self.assertNotIn('"auth_group"', tables)
+
+    def test_deactivated_user_is_rejected(self):
+        """Деактивация задачей сбрасывает кэш аутентификации"""
+        self.client.get("/lessons/")
+        User.objects.filter(pk=self.user.pk).update(
+            last_login=timezone.now() - timedelta(days=60)
+        )
+        deactivate_inactive_users()
+        response = self.client.get("/lessons/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,12 +1,22 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from drf_spectacular.utils import extend_schema
 from rest_framework import generics, status
+from rest_framework.filters import SearchFilter
 from rest_framework.generics import CreateAPIView, get_object_or_404
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .hashing import ahash_password
 from .models import User
+from .paginators import UserCursorPagination
 from .serializers import (
     UserPrivateSerializer,
     UserPublicSerializer,
@@ -14,10 +24,20 @@ from .serializers import (
 )
 
 
-@extend_schema(description="API для просмотра списка пользователей.", tags=["Users"])
+@extend_schema(
+    description="API для просмотра списка пользователей с поиском по email и городу.",
+    tags=["Users"],
+)
 class UserListAPIView(generics.ListAPIView):
-    queryset = User.objects.all()
+    # Загружаются только публичные поля (без хэша пароля и прочих данных)
+    queryset = User.objects.only("id", "email", "phone", "city", "avatar")
     serializer_class = UserPublicSerializer
+    pagination_class = UserCursorPagination
+    filter_backends = [SearchFilter]
+    # Поиск по началу строки — покрыт индексами user_email_prefix_idx и
+    # user_city_prefix_idx
+    search_fields = ["^email", "^city"]
+    query_budget = 2  # Бюджет SQL-запросов (config.metrics)
 
 
 @extend_schema(
@@ -26,6 +46,13 @@ class UserListAPIView(generics.ListAPIView):
 class UserRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
     queryset = User.objects.all()
     serializer_class = UserPublicSerializer
+    query_budget = {"get": 4, "put": 5, "patch": 5}
+
+    def get_object(self):
+        # Объект нужен и для выбора сериализатора, и для ответа — загружаем один раз
+        if not hasattr(self, "_object"):
+            self._object = super().get_object()
+        return self._object
 
     def get_serializer_class(self):
         # Если пользователь просматривает/редактирует **свой** профиль
@@ -56,6 +83,7 @@ class UserRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
 class UserRegisterView(CreateAPIView):
     serializer_class = UserRegisterSerializer
     permission_classes = [AllowAny]
+    query_budget = 2
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -71,6 +99,35 @@ class UserRegisterView(CreateAPIView):
         )
 
 
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncUserRegisterView(View):
+    """Регистрация для ASGI-сервера: пароль хэшируется в пуле потоков,
+    цикл событий и остальные запросы в это время не блокируются."""
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error."}, status=400)
+
+        serializer = UserRegisterSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=400)
+
+        password = await ahash_password(serializer.validated_data["password"])
+        user = await sync_to_async(serializer.save)(
+            password=password, password_is_hashed=True
+        )
+        refresh = RefreshToken.for_user(user)
+        return JsonResponse(
+            {
+                "refresh": str(refresh),
+                "access": str(refresh.access_token),
+            },
+            status=201,
+        )
+
+
 @extend_schema(
     description="API для удаления пользователя. Доступно только администратору.",
     tags=["Users"],